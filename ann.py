@@ -0,0 +1,156 @@
+import numpy as np
+from scipy.sparse.linalg import svds
+
+from similarity import top_k, top_k_rows
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class IVFIndex:
+    """Approximate cosine search over SVD-reduced float32 embeddings.
+
+    Rows are projected onto the top `n_components` singular vectors of the
+    TF-IDF matrix and grouped into `n_lists` inverted lists by spherical
+    k-means. A query scans the `n_probe` closest lists, keeps the best
+    `rerank` candidates by embedding score and re-scores those exactly
+    against the sparse TF-IDF rows. Larger n_probe/rerank trade latency
+    for recall. `components` (the right singular vectors) projects new
+    rows, so catalogue edits need no refit (see updated()).
+    """
+
+    def __init__(self, embeddings, centroids, list_offsets, list_items, components,
+                 n_probe=8, rerank=200):
+        self.embeddings = embeddings
+        self.components = components
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.n_probe = n_probe
+        self.rerank = rerank
+
+    @classmethod
+    def build(cls, matrix, n_components=128, n_lists=None, n_iter=10, seed=0,
+              chunk_size=4096, **search_params):
+        """Fit the projection and the inverted lists for a sparse, L2-normalised matrix"""
+        n_items = matrix.shape[0]
+        n_components = max(1, min(n_components, min(matrix.shape) - 1))
+        u, s, vt = svds(matrix.astype(np.float64), k=n_components, random_state=seed)
+        embeddings = _normalise(u * s).astype(np.float32)
+
+        n_lists = n_lists or max(1, int(np.sqrt(n_items)))
+        n_lists = min(n_lists, n_items)
+        rng = np.random.default_rng(seed)
+        centroids = embeddings[rng.choice(n_items, n_lists, replace=False)].copy()
+        assignment = np.zeros(n_items, dtype=np.int32)
+        for _ in range(n_iter):
+            for start in range(0, n_items, chunk_size):
+                block = embeddings[start:start + chunk_size] @ centroids.T
+                assignment[start:start + chunk_size] = block.argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, embeddings)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = np.flatnonzero(counts == 0)
+            # Re-seed empty lists from random rows so every list stays in use
+            sums[empty] = embeddings[rng.choice(n_items, empty.shape[0], replace=False)]
+            centroids = _normalise(sums).astype(np.float32)
+
+        list_items = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=list_offsets[1:])
+        return cls(embeddings, centroids, list_offsets, list_items, vt.astype(np.float32),
+                   **search_params)
+
+    def project(self, matrix):
+        """Normalised float32 embeddings of sparse TF-IDF rows (x @ V is u * s for fitted rows)"""
+        return _normalise(np.asarray(matrix @ self.components.T)).astype(np.float32)
+
+    def updated(self, matrix, old_positions):
+        """New index for an edited catalogue, keeping the projection and the centroids.
+
+        `old_positions[i]` is the row of this index that new row `i` was
+        carried over from unchanged, or -1 for new and changed rows, which
+        are projected and added to the list of their nearest centroid.
+        Deleted and changed rows are spliced out of their lists. Lists drift
+        from the k-means optimum as edits accumulate; build() refits them.
+        """
+        old_positions = np.asarray(old_positions)
+        n_lists = self.centroids.shape[0]
+        touched = np.flatnonzero(old_positions < 0)
+        embeddings = np.empty((old_positions.shape[0], self.embeddings.shape[1]),
+                              dtype=np.float32)
+        kept = np.flatnonzero(old_positions >= 0)
+        embeddings[kept] = self.embeddings[old_positions[kept]]
+        embeddings[touched] = self.project(matrix[touched])
+
+        # Old rows renumbered; deleted and changed ones drop out of their lists
+        old_to_new = np.full(self.embeddings.shape[0], -1, dtype=np.int64)
+        old_to_new[old_positions[kept]] = kept
+        items = old_to_new[self.list_items]
+        survives = items >= 0
+        lists = np.repeat(np.arange(n_lists), np.diff(self.list_offsets))
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists[survives], minlength=n_lists), out=offsets[1:])
+
+        # New and changed rows are appended to the end of their nearest list
+        nearest = (embeddings[touched] @ self.centroids.T).argmax(axis=1)
+        order = np.argsort(nearest, kind='stable')
+        list_items = np.insert(items[survives], offsets[nearest[order] + 1],
+                               touched[order]).astype(np.int32)
+        offsets += np.concatenate(([0], np.cumsum(np.bincount(nearest, minlength=n_lists))))
+        return IVFIndex(embeddings, self.centroids, offsets, list_items, self.components,
+                        self.n_probe, self.rerank)
+
+    def candidates(self, idx, n_probe=None):
+        """Rows in the n_probe inverted lists closest to row `idx`"""
+        n_probe = min(n_probe or self.n_probe, self.centroids.shape[0])
+        lists, _ = top_k(self.centroids @ self.embeddings[idx], n_probe)
+        return np.concatenate([self.list_items[self.list_offsets[i]:self.list_offsets[i + 1]]
+                               for i in lists])
+
+    def _depth(self, k, n_probe=None, rerank=None):
+        """(n_probe, rerank) for a top-k search"""
+        n_probe = n_probe or self.n_probe
+        rerank = rerank or self.rerank
+        if k > rerank:
+            # Windows deeper than the shortlist probe proportionally more lists
+            n_probe = -(-n_probe * k // rerank)
+            rerank = k
+        return n_probe, rerank
+
+    def search(self, matrix, idx, k, n_probe=None, rerank=None):
+        """Approximate top-k (indices, exact scores) for row `idx`, excluding itself"""
+        indices, scores = self.search_rows(matrix, np.array([idx]), k, n_probe, rerank)
+        found = np.isfinite(scores[0])
+        return indices[0][found], scores[0][found]
+
+    def search_rows(self, matrix, rows, k, n_probe=None, rerank=None):
+        """search() for several query rows, as (indices, scores) padded with -inf scores.
+
+        Searches deeper than `rerank` probe proportionally more lists and
+        re-score k rows, so widening a search never falls back to a full scan.
+        """
+        n_probe, rerank = self._depth(k, n_probe, rerank)
+        shortlists, exact = [], []
+        for idx in rows:
+            candidates = self.candidates(idx, n_probe)
+            candidates = candidates[candidates != idx]
+            shortlist, _ = top_k(self.embeddings[candidates] @ self.embeddings[idx], rerank)
+            shortlist = np.sort(candidates[shortlist])
+            shortlists.append(shortlist)
+            # Sparse x dense query row; cheaper than a sparse x sparse product per query
+            exact.append(matrix[shortlist] @ matrix[idx].toarray().ravel())
+
+        # Shortlists padded into one block; ties break by lower row id as in top_k
+        sizes = np.array([shortlist.shape[0] for shortlist in shortlists], dtype=np.intp)
+        padded = np.arange(int(sizes.max()) if sizes.shape[0] else 0) < sizes[:, None]
+        candidates = np.zeros(padded.shape, dtype=np.intp)
+        block = np.full(padded.shape, -np.inf)
+        if shortlists:
+            candidates[padded] = np.concatenate(shortlists)
+            block[padded] = np.concatenate(exact)
+        order, scores = top_k_rows(block, k)
+        return np.take_along_axis(candidates, order, axis=1), scores
@@ -0,0 +1,195 @@
+"""JSON endpoints served from the Dash app's Flask server.
+
+The routes call the same recommender functions as the Dash callbacks, so
+they share the loaded (memory-mapped) model and the recommendation caches.
+"""
+import hmac
+import math
+import os
+
+from flask import Blueprint, jsonify, request
+
+from ingest import CATEGORY_COLUMNS, TEXT_COLUMNS
+from instrumentation import profiler
+from microbatch import recommend
+from recommender import (BLOCKING_MODES, MAX_RECOMMENDATIONS, MAX_SUGGESTIONS,
+                         N_RECOMMENDATIONS, N_SUGGESTIONS, RANKER, RANKERS, current_model,
+                         get_drug_details, get_price_range, record_updates, reload_model,
+                         suggest_drugs)
+from side_effects import parse_side_effects
+
+# Catalogue-changing routes are disabled unless this token is configured
+ADMIN_TOKEN = os.environ.get("RECOMMENDER_ADMIN_TOKEN")
+
+blueprint = Blueprint("api", __name__, url_prefix="/api")
+
+
+def _json_value(value):
+    """Plain JSON value for a record field; NaN and numpy scalars are normalised"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _float_arg(name):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be finite")
+    return number
+
+
+def _error(message, status):
+    return jsonify({'error': message}), status
+
+
+@blueprint.route("/drugs/<path:name>")
+def drug_details(name):
+    details = get_drug_details(name)
+    if details is None:
+        return _error(f"Drug not found: {name}", 404)
+    body = {key: _json_value(value) for key, value in details.items()}
+    # Prices are stored as float32; round away the representation noise
+    body['Price'] = None if body['Price'] == -1 else round(body['Price'], 2)
+    body['side_effects'] = parse_side_effects(details['side_effect_features'])
+    return jsonify(body)
+
+
+@blueprint.route("/suggest")
+def suggest():
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', N_SUGGESTIONS))
+    except ValueError:
+        return _error("limit must be an integer", 400)
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return _error(f"limit must be between 1 and {MAX_SUGGESTIONS}", 400)
+    return jsonify({'query': query, 'suggestions': suggest_drugs(query, limit)})
+
+
+@blueprint.route("/recommendations")
+def recommendations():
+    drug_name = request.args.get('drug', '')
+    if get_drug_details(drug_name) is None:
+        return _error(f"Drug not found: {drug_name}", 404)
+    try:
+        k = int(request.args.get('k', N_RECOMMENDATIONS))
+    except ValueError:
+        return _error("k must be an integer", 400)
+    try:
+        min_price = _float_arg('min_price')
+        max_price = _float_arg('max_price')
+    except ValueError as e:
+        return _error(str(e), 400)
+    if not 1 <= k <= MAX_RECOMMENDATIONS:
+        return _error(f"k must be between 1 and {MAX_RECOMMENDATIONS}", 400)
+    ranker = request.args.get('ranker', RANKER)
+    if ranker not in RANKERS:
+        return _error(f"ranker must be one of: {', '.join(RANKERS)}", 400)
+    blocking = request.args.get('blocking') or None
+    if blocking not in BLOCKING_MODES:
+        return _error(f"blocking must be one of: {', '.join(BLOCKING_MODES[1:])}", 400)
+
+    price_range = None
+    if min_price is not None or max_price is not None:
+        price_range = (min_price if min_price is not None else 0,
+                       max_price if max_price is not None else math.inf)
+    # Accept both repeated ?exclude=a&exclude=b and comma-separated ?exclude=a,b
+    excluded = [term for value in request.args.getlist('exclude')
+                for term in parse_side_effects(value)]
+
+    results = recommend(drug_name, price_range, excluded, k=k, ranker=ranker, blocking=blocking)
+    return jsonify({
+        'drug': drug_name.lower().strip(),
+        'ranker': ranker,
+        'blocking': blocking,
+        'price_range': {'min': min_price, 'max': max_price} if price_range else None,
+        'excluded_side_effects': excluded,
+        'recommendations': [{'name': name, 'similarity': similarity}
+                            for name, similarity in results],
+    })
+
+
+@blueprint.route("/price-range")
+def price_range():
+    min_price, max_price = get_price_range()
+    return jsonify({'min': float(min_price), 'max': float(max_price)})
+
+
+def _authorised():
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied, ADMIN_TOKEN)
+
+
+def _upsert_problem(row):
+    """Why an upsert record cannot be applied, or None if it is valid"""
+    if not isinstance(row, dict):
+        return "each record must be an object"
+    if not isinstance(row.get('name'), str) or not row['name'].strip():
+        return "each record needs a non-empty 'name'"
+    for col in TEXT_COLUMNS + CATEGORY_COLUMNS:
+        if row.get(col) is not None and not isinstance(row[col], str):
+            return f"'{col}' must be a string"
+    price = row.get('Price')
+    if price is not None:
+        try:
+            if isinstance(price, bool):
+                raise TypeError
+            float(price)
+        except (TypeError, ValueError):
+            return f"'Price' must be a number, got {price!r}"
+    return None
+
+
+@blueprint.route("/admin/drugs", methods=["POST"])
+def update_drugs():
+    """Apply {"upsert": [{...drug row...}], "delete": ["name", ...]} to every worker's model"""
+    if not _authorised():
+        return _error("Forbidden", 403)
+    body = request.get_json(silent=True) or {}
+    upserts = body.get('upsert') or []
+    deletes = body.get('delete') or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list) or \
+            any(not isinstance(name, str) for name in deletes):
+        return _error("Expected 'upsert' as a list of objects and 'delete' as a list of names",
+                      400)
+    for row in upserts:
+        problem = _upsert_problem(row)
+        if problem:
+            return _error(f"Invalid upsert: {problem}", 400)
+    version = record_updates(upserts, deletes)
+    return jsonify({'version': version, 'drugs': current_model().n_items})
+
+
+@blueprint.route("/admin/reload", methods=["POST"])
+def reload():
+    """Refit from the data file on disk and swap the model in"""
+    if not _authorised():
+        return _error("Forbidden", 403)
+    model = reload_model()
+    return jsonify({'version': model.version, 'drugs': model.n_items})
+
+
+@blueprint.route("/admin/profiler", methods=["POST"])
+def configure_profiler():
+    """Set the slow-request profiler: {"sample_rate": 0..1, "slow_ms": threshold}"""
+    if not _authorised():
+        return _error("Forbidden", 403)
+    body = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(body.get('sample_rate', profiler.sample_rate))
+        slow_ms = float(body.get('slow_ms', profiler.slow_ms))
+    except (TypeError, ValueError):
+        return _error("sample_rate and slow_ms must be numbers", 400)
+    if not 0 <= sample_rate <= 1 or slow_ms < 0:
+        return _error("sample_rate must be in [0, 1] and slow_ms non-negative", 400)
+    profiler.sample_rate, profiler.slow_ms = sample_rate, slow_ms
+    return jsonify({'sample_rate': sample_rate, 'slow_ms': slow_ms,
+                    'out_dir': profiler.out_dir, 'dumped': profiler.dumped})
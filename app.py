@@ -2,12 +2,59 @@ from dash import Dash, html, dcc, callback_context, no_update
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State, ALL
 import layout
-from recommender import get_alternative_drugs, get_drug_details, get_price_range
+import api
+import microbatch
+from instrumentation import instrument_server, prometheus_lines, span, timed
+from recommender import (cache_stats, find_drug, get_drug_details, get_price_range,
+                         maybe_reload, suggest_drugs)
+from side_effects import parse_side_effects
 import pandas as pd
+from flask import Response
+
+# How long the price slider must rest before recommendations re-run
+SLIDER_DEBOUNCE_MS = 300
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
-app.layout = layout.create_layout()
+server.register_blueprint(api.blueprint)
+# Per-route request latency, plus cProfile dumps of slow requests when enabled
+instrument_server(server)
+
+
+@server.before_request
+def check_for_new_data():
+    # Picks up edits to the data file when RECOMMENDER_RELOAD_SECONDS is set
+    maybe_reload()
+
+
+def serve_layout():
+    # Evaluated per page load, so the slider bounds follow the current model without a callback
+    price_min, price_max = get_price_range()
+    return layout.create_layout(int(float(price_min)), int(float(price_max)))
+
+
+app.layout = serve_layout
+
+
+@server.route("/metrics")
+def metrics():
+    """Cache counters and span latency summaries in Prometheus text exposition format"""
+    lines = []
+    caches = cache_stats()
+    for stat in ("entries", "bytes", "hits", "misses", "evictions", "expirations"):
+        if stat in ("entries", "bytes"):
+            metric, kind = f"recommender_cache_{stat}", "gauge"
+        else:
+            metric, kind = f"recommender_cache_{stat}_total", "counter"
+        lines.append(f"# TYPE {metric} {kind}")
+        for cache_name, stats in caches.items():
+            lines.append(f'{metric}{{cache="{cache_name}"}} {stats[stat]}')
+    if microbatch.batcher is not None:
+        for stat, count in microbatch.batcher.stats().items():
+            lines.append(f"# TYPE recommender_microbatch_{stat}_total counter")
+            lines.append(f"recommender_microbatch_{stat}_total {count}")
+    lines.extend(prometheus_lines())
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
 
 @app.callback(
     [Output("output-container", "children"),
@@ -16,34 +63,30 @@ app.layout = layout.create_layout()
      Output("therapeutic-uses", "children"),
      Output("side-effects", "children"),
      Output("side-effects-checklist", "options"),
-     Output("price-range-slider", "min"),
-     Output("price-range-slider", "max"),
-     Output("price-range-slider", "marks"),
+     Output("side-effects-checklist", "value"),
      Output("current-drug-price", "children"),
-     Output("recommended-drugs", "children")],
-    [Input("drug-input", "value"),
-     Input("side-effects-checklist", "value"),
-     Input("price-range-slider", "value"),
-     Input("price-filter-toggle", "value")],
+     Output("selected-drug", "data")],
+    [Input("drug-input", "value")],
+    [State("selected-drug", "data")],
     prevent_initial_call=True
 )
-def update_all(drug_name, excluded_effects, price_range, price_filter_enabled):
-    # Price range setup
-    price_min, price_max = get_price_range()
-    price_min = int(float(price_min))
-    price_max = int(float(price_max))
-    step_size = max(1, (price_max - price_min) // 4)
-    marks = {i: str(i) for i in range(price_min, price_max + 1, step_size)}
-
+@timed("callback.show_drug_details")
+def show_drug_details(drug_name, selected_drug):
     if not drug_name:
         return ["Please enter a drug name.", "No data", "No data", "No data", "No data", [],
-                price_min, price_max, marks, "", []]
+                [], "", None]
 
     drug_details = get_drug_details(drug_name.lower().strip())
     if drug_details is None:
         return ["Drug not found", "No data", "No data", "No data", "No data", [],
-                price_min, price_max, marks, "Price info not available", []]
+                [], "Price info not available", None]
+    # Retyping the same drug (e.g. changing case) keeps the checklist and skips re-ranking
+    if drug_details['name'] == selected_drug:
+        return [no_update] * 9
+    with span("callback.show_drug_details.render"):
+        return _render_drug_details(drug_details)
 
+def _render_drug_details(drug_details):
     # Process drug details
     therapeutic_class = (drug_details['Therapeutic Class'] 
                          if pd.notna(drug_details['Therapeutic Class'])
@@ -67,7 +110,7 @@ def update_all(drug_name, excluded_effects, price_range, price_filter_enabled):
     side_effects = (drug_details['side_effect_features'] 
                     if pd.notna(drug_details['side_effect_features']) 
                     else "N/A")
-    effects = [e.strip() for e in str(side_effects).split(',') if e.strip()]
+    effects = parse_side_effects(side_effects)
     side_effect_options = [{'label': eff, 'value': eff} for eff in effects]
     
     # Price display with red text
@@ -84,37 +127,6 @@ def update_all(drug_name, excluded_effects, price_range, price_filter_enabled):
         ])
     )
 
-    # Recommendations using the provided filters
-    active_price_range = price_range if price_filter_enabled else None
-    recommendations = get_alternative_drugs(drug_name, active_price_range, excluded_effects)
-    
-    if not recommendations:
-        # If no recommendations and price filter is enabled, suggest turning it off.
-        if price_filter_enabled:
-            rec_children = [html.Div("No alternatives found with these filters. Consider turning off the price filter to see more options.", className="text-center")]
-        else:
-            rec_children = [html.Div("No alternatives found with these filters.", className="text-center")]
-    else:
-        rec_children = []
-        for drug, similarity in recommendations:
-            if drug.lower() == drug_name.lower():
-                continue
-            rec_children.append(
-                dbc.Button(
-                    drug.capitalize(),
-                    id={'type': 'recommendation-button', 'index': drug},
-                    className="m-1",
-                    color="primary",
-                    n_clicks=0,
-                )
-            )
-            rec_children.append(
-                dbc.Tooltip(
-                    f"Similarity: {similarity:.2f}",
-                    target={'type': 'recommendation-button', 'index': drug},
-                )
-            )
-
     return [
         "",
         therapeutic_class,
@@ -122,46 +134,129 @@ def update_all(drug_name, excluded_effects, price_range, price_filter_enabled):
         therapeutic_uses,
         ", ".join(effects) if effects else "No side effects reported",
         side_effect_options,
-        price_min,
-        price_max,
-        marks,
+        [],
         price_display,
-        rec_children
+        drug_details['name']
     ]
 
+# Only the recommendations re-run when a filter changes; the drug details above do not
 @app.callback(
+    Output("recommended-drugs", "children"),
+    [Input("selected-drug", "data"),
+     Input("side-effects-checklist", "value"),
+     Input("price-range", "data"),
+     Input("price-filter-toggle", "value")],
+    prevent_initial_call=True
+)
+@timed("callback.update_recommendations")
+def update_recommendations(drug_name, excluded_effects, price_range, price_filter_enabled):
+    if not drug_name:
+        return []
+
+    # Recommendations using the provided filters
+    active_price_range = price_range if price_filter_enabled else None
+    recommendations = microbatch.recommend(drug_name, active_price_range, excluded_effects)
+    
+    if not recommendations:
+        # If no recommendations and price filter is enabled, suggest turning it off.
+        if price_filter_enabled:
+            return [html.Div("No alternatives found with these filters. Consider turning off the price filter to see more options.", className="text-center")]
+        return [html.Div("No alternatives found with these filters.", className="text-center")]
+    with span("callback.update_recommendations.render"):
+        return _render_recommendations(drug_name, recommendations)
+
+def _render_recommendations(drug_name, recommendations):
+    rec_children = []
+    for drug, similarity in recommendations:
+        if drug.lower() == drug_name.lower():
+            continue
+        rec_children.append(
+            dbc.Button(
+                drug.capitalize(),
+                id={'type': 'recommendation-button', 'index': drug},
+                className="m-1",
+                color="primary",
+                n_clicks=0,
+            )
+        )
+        rec_children.append(
+            dbc.Tooltip(
+                f"Similarity: {similarity:.2f}",
+                target={'type': 'recommendation-button', 'index': drug},
+            )
+        )
+    return rec_children
+
+# Pure UI state is handled in the browser, without a server round trip
+app.clientside_callback(
+    """
+    function(enableFilter) {
+        // Only visually dim the slider
+        return [!enableFilter, {'opacity': enableFilter ? 1 : 0.5}];
+    }
+    """,
     [Output("price-range-slider", "disabled"),
      Output("price-filter-col", "style")],
     [Input("price-filter-toggle", "value")]
 )
-def toggle_price_filter(enable_filter):
-    if not enable_filter:
-        return True, {'opacity': 0.5}  # Only visually dim the slider
-    return False, {'opacity': 1}
+
+# Debounce the slider: only a value held for SLIDER_DEBOUNCE_MS reaches the server
+app.clientside_callback(
+    f"""
+    function(value) {{
+        const ticket = window.priceSliderTicket = (window.priceSliderTicket || 0) + 1;
+        return new Promise(resolve => setTimeout(() => resolve(
+            ticket === window.priceSliderTicket ? value : window.dash_clientside.no_update
+        ), {SLIDER_DEBOUNCE_MS}));
+    }}
+    """,
+    Output("price-range", "data"),
+    Input("price-range-slider", "value"),
+    prevent_initial_call=True
+)
 
 @app.callback(
     Output("drug-input", "value"),
-    [Input({'type': 'recommendation-button', 'index': ALL}, 'n_clicks')],
-    [State({'type': 'recommendation-button', 'index': ALL}, "id")]
+    [Input({'type': 'recommendation-button', 'index': ALL}, 'n_clicks'),
+     Input({'type': 'name-suggestion', 'index': ALL}, 'n_clicks')],
+    prevent_initial_call=True
 )
-def update_input(n_clicks, button_ids):
+@timed("callback.update_input")
+def update_input(recommendation_clicks, suggestion_clicks):
     ctx = callback_context
-    if not ctx.triggered:
+    # Buttons are recreated with n_clicks=0, which also fires this callback
+    if not ctx.triggered or not ctx.triggered[0]['value']:
         return no_update
-    
-    clicked_idx = next((i for i, n in enumerate(n_clicks) if n), None)
-    return button_ids[clicked_idx]['index'] if clicked_idx is not None else no_update
+    return ctx.triggered_id['index']
 
-# New callback to toggle visibility of the entire results section (suggestions, filters, drug info)
 @app.callback(
-    Output("results-section", "style"),
+    Output("drug-suggestions", "children"),
     [Input("drug-input", "value")]
 )
-def toggle_results_section(drug_name):
-    if drug_name and (get_drug_details(drug_name.lower().strip()) is not None):
-         return {"display": "block"}
-    else:
-         return {"display": "none"}
+@timed("callback.update_suggestions")
+def update_suggestions(drug_name):
+    if not drug_name or find_drug(drug_name) is not None:
+        return []
+    return [
+        dbc.ListGroupItem(
+            name.capitalize(),
+            id={'type': 'name-suggestion', 'index': name},
+            action=True,
+            n_clicks=0,
+        )
+        for name in suggest_drugs(drug_name)
+    ]
+
+# Show the results section (suggestions, filters, drug info) only while a known drug is selected
+app.clientside_callback(
+    """
+    function(selectedDrug) {
+        return {'display': selectedDrug ? 'block' : 'none'};
+    }
+    """,
+    Output("results-section", "style"),
+    [Input("selected-drug", "data")]
+)
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann import IVFIndex
+from similarity import SimilarityEngine
+
+# Bump whenever the on-disk layout or the vectorizer settings change
+FORMAT_VERSION = 5
+MANIFEST = "manifest.json"
+ANN_ARRAYS = ('embeddings', 'centroids', 'list_offsets', 'list_items', 'components')
+
+
+def file_sha256(path):
+    """Content hash of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_path(artifact_dir, content_hash, backend='exact'):
+    """Directory holding the artifact for a given data hash, backend and format version"""
+    return os.path.join(artifact_dir, f"v{FORMAT_VERSION}-{content_hash[:16]}-{backend}")
+
+
+def is_current(path, content_hash, backend='exact'):
+    """True if `path` holds a complete artifact built from data with `content_hash`"""
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (manifest.get('format_version') == FORMAT_VERSION and
+            manifest.get('content_hash') == content_hash and
+            manifest.get('backend') == backend)
+
+
+def _save_csr(path, prefix, matrix):
+    np.save(os.path.join(path, f"{prefix}_data.npy"), matrix.data)
+    np.save(os.path.join(path, f"{prefix}_indices.npy"), matrix.indices)
+    np.save(os.path.join(path, f"{prefix}_indptr.npy"), matrix.indptr)
+
+
+def _load_csr(path, prefix, shape):
+    # Memory-mapped arrays are shared page-cache pages across worker processes
+    parts = [np.load(os.path.join(path, f"{prefix}_{name}.npy"), mmap_mode='r')
+             for name in ('data', 'indices', 'indptr')]
+    return csr_matrix(tuple(parts), shape=shape, copy=False)
+
+
+def save_artifact(artifact_dir, content_hash, tfidf, engine, backend='exact'):
+    """Write the fitted model to a versioned directory and return its path.
+
+    The artifact is assembled in a temporary directory and renamed into
+    place, so concurrent builders never expose a partially written model.
+    """
+    path = artifact_path(artifact_dir, content_hash, backend)
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.build-', dir=artifact_dir)
+    # mkdtemp creates the directory private to this user; workers may run as another
+    os.chmod(tmp, 0o755)
+    try:
+        with open(os.path.join(tmp, 'vocabulary.json'), 'w') as f:
+            json.dump(tfidf.get_feature_names_out().tolist(), f)
+        np.save(os.path.join(tmp, 'idf.npy'), tfidf.idf_)
+        _save_csr(tmp, 'tfidf', engine.matrix)
+        _save_csr(tmp, 'tfidf_t', engine.matrix_t)
+        if engine.neighbour_indices is not None:
+            np.save(os.path.join(tmp, 'neighbour_indices.npy'), engine.neighbour_indices)
+            np.save(os.path.join(tmp, 'neighbour_scores.npy'), engine.neighbour_scores)
+        ann_index = engine.ann_index
+        if ann_index is not None:
+            for name in ANN_ARRAYS:
+                np.save(os.path.join(tmp, f"ann_{name}.npy"), getattr(ann_index, name))
+        for mode, (rows, offsets, blocked) in engine.class_layouts.items():
+            np.save(os.path.join(tmp, f"blocks_{mode}_rows.npy"), rows)
+            np.save(os.path.join(tmp, f"blocks_{mode}_offsets.npy"), offsets)
+            _save_csr(tmp, f"blocks_{mode}", blocked)
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'content_hash': content_hash,
+            'backend': backend,
+            'shape': list(engine.matrix.shape),
+            'vectorizer': {'stop_words': tfidf.stop_words,
+                           'ngram_range': list(tfidf.ngram_range)},
+            'neighbour_k': (None if engine.neighbour_indices is None
+                            else int(engine.neighbour_indices.shape[1])),
+            'ann': (None if ann_index is None
+                    else {'n_probe': ann_index.n_probe, 'rerank': ann_index.rerank}),
+            'class_layouts': {mode: list(layout[2].shape)
+                              for mode, layout in engine.class_layouts.items()},
+        }
+        # The manifest is written last; its presence marks the artifact complete
+        with open(os.path.join(tmp, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp, path)
+    except OSError:
+        # Another worker renamed its build into place first; keep theirs
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not is_current(path, content_hash, backend):
+            raise
+    return path
+
+
+def load_artifact(path, ann_search=None):
+    """Load a saved model as (tfidf, engine) with memory-mapped arrays.
+
+    `ann_search` ({'n_probe': ..., 'rerank': ...}) overrides the ANN query
+    settings saved at build time; they do not affect the stored index.
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    with open(os.path.join(path, 'vocabulary.json')) as f:
+        vocabulary = {term: i for i, term in enumerate(json.load(f))}
+
+    settings = manifest['vectorizer']
+    tfidf = TfidfVectorizer(stop_words=settings['stop_words'],
+                            ngram_range=tuple(settings['ngram_range']),
+                            vocabulary=vocabulary)
+    tfidf.idf_ = np.load(os.path.join(path, 'idf.npy'))
+
+    shape = tuple(manifest['shape'])
+    neighbour_indices = neighbour_scores = None
+    if manifest['neighbour_k'] is not None:
+        neighbour_indices = np.load(os.path.join(path, 'neighbour_indices.npy'), mmap_mode='r')
+        neighbour_scores = np.load(os.path.join(path, 'neighbour_scores.npy'), mmap_mode='r')
+    ann_index = None
+    if manifest['ann'] is not None:
+        arrays = {name: np.load(os.path.join(path, f"ann_{name}.npy"), mmap_mode='r')
+                  for name in ANN_ARRAYS}
+        ann_index = IVFIndex(**arrays, **{**manifest['ann'], **(ann_search or {})})
+    class_layouts = {
+        mode: (np.load(os.path.join(path, f"blocks_{mode}_rows.npy"), mmap_mode='r'),
+               np.load(os.path.join(path, f"blocks_{mode}_offsets.npy"), mmap_mode='r'),
+               _load_csr(path, f"blocks_{mode}", tuple(blocked_shape)))
+        for mode, blocked_shape in manifest['class_layouts'].items()}
+    engine = SimilarityEngine(_load_csr(path, 'tfidf', shape),
+                              matrix_t=_load_csr(path, 'tfidf_t', shape[::-1]),
+                              neighbour_indices=neighbour_indices,
+                              neighbour_scores=neighbour_scores,
+                              ann_index=ann_index,
+                              class_layouts=class_layouts)
+    return tfidf, engine
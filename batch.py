@@ -0,0 +1,154 @@
+"""Offline bulk scoring: stream drug names from CSV/JSONL to recommendations.
+
+    python -m batch formulary.csv alternatives.jsonl --k 5 --workers 4
+
+CSV input reads the `name` column (or the first column); JSONL input reads
+the `name` field of each object. Output format follows the output file
+extension: JSONL writes one object per drug, CSV one row per alternative.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import recommender
+
+DEFAULT_BATCH_SIZE = 1024
+
+
+def file_format(path, override=None):
+    if override:
+        return override
+    return 'jsonl' if path.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def read_names(f, fmt):
+    """Yield drug names from an open CSV or JSONL file"""
+    if fmt == 'jsonl':
+        for line in f:
+            if line.strip():
+                yield json.loads(line)['name']
+        return
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    column = header.index('name') if 'name' in header else 0
+    if 'name' not in header:
+        # Headerless file: the first line is already data
+        yield header[column]
+    for row in reader:
+        if row:
+            yield row[column]
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ResultWriter:
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.writer(f)
+            self.writer.writerow(['name', 'rank', 'alternative', 'similarity'])
+
+    def write(self, names, results):
+        for name, alternatives in zip(names, results):
+            if self.fmt == 'jsonl':
+                self.f.write(json.dumps({
+                    'name': name,
+                    'alternatives': [{'name': alt, 'similarity': round(sim, 6)}
+                                     for alt, sim in alternatives],
+                }) + '\n')
+            else:
+                for rank, (alt, sim) in enumerate(alternatives, start=1):
+                    self.writer.writerow([name, rank, alt, f"{sim:.6f}"])
+
+
+def score_chunk(names, k, price_range, excluded_side_effects):
+    """Worker entry point; the model is loaded once per process on import"""
+    return names, recommender.get_alternatives_batch(names, k, price_range,
+                                                     excluded_side_effects)
+
+
+def run(names, writer, k, price_range, excluded_side_effects, batch_size, workers):
+    """Score `names` chunk by chunk, writing results in input order. Returns the count."""
+    total = 0
+    chunks = chunked(names, batch_size)
+    if workers <= 1:
+        for chunk in chunks:
+            writer.write(*score_chunk(chunk, k, price_range, excluded_side_effects))
+            total += len(chunk)
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Bound the number of chunks in flight so huge inputs stream
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk, k, price_range,
+                                           excluded_side_effects))
+            if len(pending) >= 2 * workers:
+                done_names, results = pending.popleft().result()
+                writer.write(done_names, results)
+                total += len(done_names)
+        while pending:
+            done_names, results = pending.popleft().result()
+            writer.write(done_names, results)
+            total += len(done_names)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk drug alternative recommendations")
+    parser.add_argument("input", help="CSV or JSONL file of drug names ('-' for stdin)")
+    parser.add_argument("output", help="CSV or JSONL output file ('-' for stdout)")
+    parser.add_argument("--k", type=int, default=recommender.N_RECOMMENDATIONS,
+                        help="alternatives per drug")
+    parser.add_argument("--min-price", type=float)
+    parser.add_argument("--max-price", type=float)
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="side effect to exclude (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--input-format", choices=['csv', 'jsonl'])
+    parser.add_argument("--output-format", choices=['csv', 'jsonl'])
+    args = parser.parse_args(argv)
+
+    price_range = None
+    if args.min_price is not None or args.max_price is not None:
+        price_range = (args.min_price if args.min_price is not None else 0,
+                       args.max_price if args.max_price is not None else float('inf'))
+
+    in_fmt = file_format(args.input, args.input_format)
+    out_fmt = file_format(args.output, args.output_format)
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    start = time.perf_counter()
+    try:
+        total = run(read_names(fin, in_fmt), ResultWriter(fout, out_fmt), args.k,
+                    price_range, args.exclude, args.batch_size, args.workers)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0
+    print(f"Scored {total} drugs in {elapsed:.2f}s ({rate:.0f} drugs/s, "
+          f"{args.workers} worker(s))", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Recall@K and latency of the approximate IVF index against exact cosine ranking.
+
+    python benchmarks/bench_ann.py --k 10 --queries 500
+
+A returned neighbour counts as a hit when its exact score reaches the exact
+k-th best score, so ties at the cut-off are not counted as misses.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann import IVFIndex
+from ingest import iter_documents, load_catalogue
+from similarity import SimilarityEngine
+
+GRID = [(1, 50), (2, 100), (4, 100), (8, 200), (16, 400), (32, 800)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/drugs.csv")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--components", type=int, default=128)
+    parser.add_argument("--lists", type=int, default=None)
+    args = parser.parse_args()
+
+    df = load_catalogue(args.data)
+    matrix = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)) \
+        .fit_transform(iter_documents(df))
+    engine = SimilarityEngine(matrix)
+    start = time.perf_counter()
+    index = IVFIndex.build(engine.matrix, n_components=args.components, n_lists=args.lists)
+    build_seconds = time.perf_counter() - start
+
+    queries = np.random.default_rng(0).choice(engine.n_items, args.queries, replace=False)
+    start = time.perf_counter()
+    for q in queries:
+        engine.ranked(q, args.k)
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1e3
+    exact_rows = {q: engine.scores(q) for q in queries}
+
+    report = {'rows': engine.n_items, 'k': args.k, 'components': args.components,
+              'lists': int(index.centroids.shape[0]), 'build_seconds': round(build_seconds, 2),
+              'exact_ms_per_query': round(exact_ms, 3), 'settings': []}
+    for n_probe, rerank in GRID:
+        start = time.perf_counter()
+        found = [index.search(engine.matrix, q, args.k, n_probe, rerank)[0] for q in queries]
+        ann_ms = (time.perf_counter() - start) / len(queries) * 1e3
+        hits = 0
+        for q, rows in zip(queries, found):
+            row = exact_rows[q].copy()
+            row[q] = -np.inf
+            kth = np.sort(row)[-args.k]
+            hits += min(args.k, int((row[rows] >= kth - 1e-9).sum()))
+        report['settings'].append({'n_probe': n_probe, 'rerank': rerank,
+                                   f'recall@{args.k}': round(hits / (args.k * len(queries)), 4),
+                                   'ms_per_query': round(ann_ms, 3)})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
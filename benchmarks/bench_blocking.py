@@ -0,0 +1,100 @@
+"""Class-blocked search vs a full similarity scan: latency and result overlap.
+
+Run from the repository root:
+
+    python benchmarks/bench_blocking.py --queries 1000 --k 5
+
+"full scan" scores the query against every drug; "blocked" scores only the
+drugs of its class block(s); "default" is the unblocked production path
+(neighbour table, then growing windows). A blocked result counts towards
+recall when its score reaches the full scan's k-th best, so ties at the
+cut-off are not misses. "fallback" is the share of queries the blocked
+search could not answer (no class, or fewer than k drugs passing filters).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recommender
+from blocking import BLOCKING_COLUMNS
+from similarity import top_k
+
+
+def full_scan(model, idx, k, excluded):
+    row = model.engine.scores(idx)
+    row[idx] = -np.inf
+    keep = np.flatnonzero(model.filter_mask(np.arange(model.n_items), None, excluded))
+    order, scores = top_k(row[keep], k)
+    return keep[order], scores
+
+
+def timed(fn, queries):
+    results, timings = [], []
+    for idx in queries:
+        start = time.perf_counter()
+        results.append(fn(idx))
+        timings.append(time.perf_counter() - start)
+    us = np.asarray(timings) * 1e6
+    return results, {'p50_us': round(float(np.percentile(us, 50)), 1),
+                     'p99_us': round(float(np.percentile(us, 99)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=recommender.N_RECOMMENDATIONS)
+    args = parser.parse_args()
+
+    model = recommender.current_model()
+    k = args.k
+    queries = np.random.default_rng(0).choice(model.n_items, args.queries, replace=False)
+    effects = model.df['side_effect_features'].str.split(',').explode().str.strip()
+    common_effects = effects[effects != ''].value_counts().index[:2].tolist()
+
+    report = {'drugs': model.n_items, 'queries': len(queries), 'k': k, 'modes': {}}
+    for mode in BLOCKING_COLUMNS:
+        # Built on first use, from the artifact's memory-mapped block layout when it has one
+        start = time.perf_counter()
+        blocks = model.class_blocks(mode)
+        build_seconds = time.perf_counter() - start
+        sizes = np.diff(blocks.offsets)
+        searched = [int(sizes[blocks.search_set(i)].sum()) if blocks.search_set(i) is not None
+                    else model.n_items for i in queries]
+        entry = {'build_seconds': round(build_seconds, 3),
+                 'blocks': blocks.n_blocks,
+                 'mean_rows_scored': round(float(np.mean(searched)), 1)}
+        for mix, excluded in (('none', None), ('side_effects', common_effects)):
+            full, full_latency = timed(lambda i: full_scan(model, i, k, excluded), queries)
+            blocked, blocked_latency = timed(
+                lambda i: recommender.blocked_candidates(model, i, k, None, excluded, mode),
+                queries)
+            _, default_latency = timed(
+                lambda i: recommender.filtered_candidates(model, i, k, None, excluded), queries)
+
+            hits = overlap = fallback = 0
+            for (full_rows, full_scores), found in zip(full, blocked):
+                if found is None or found[0].shape[0] < k:
+                    fallback += 1
+                    continue
+                kth = full_scores[-1] if full_scores.shape[0] else -np.inf
+                hits += int((found[1] >= kth - 1e-9).sum())
+                overlap += len(set(found[0].tolist()) & set(full_rows.tolist()))
+            answered = len(queries) - fallback
+            entry[mix] = {
+                'full_scan': full_latency, 'blocked': blocked_latency, 'default': default_latency,
+                'speedup_vs_full_scan': round(full_latency['p50_us'] / blocked_latency['p50_us'], 2),
+                f'recall@{k}': round(hits / (k * answered), 4) if answered else None,
+                f'overlap@{k}': round(overlap / (k * answered), 4) if answered else None,
+                'fallback': round(fallback / len(queries), 4),
+            }
+        report['modes'][mode] = entry
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Peak RSS of catalogue ingestion + TF-IDF fit: legacy full read vs chunked compact read.
+
+Builds a synthetic catalogue by replicating data/drugs.csv with unique names,
+then measures each path in a fresh subprocess:
+
+    python benchmarks/bench_ingest.py --scale 50
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_synthetic(source, path, scale):
+    base = pd.read_csv(source)
+    with open(path, 'w', newline='') as f:
+        for copy in range(scale):
+            part = base.copy()
+            part['id'] = part['id'] + copy * 10_000_000
+            part['name'] = part['name'] + f" {copy}"
+            part.to_csv(f, index=False, header=copy == 0)
+
+
+def legacy(path):
+    """The original ingestion: every column, default dtypes, concatenated text Series"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    df = pd.read_csv(path)
+    df['name'] = df['name'].str.lower().str.strip()
+    df['uses_features'] = df['uses_features'].fillna('').astype(str)
+    df['side_effect_features'] = df['side_effect_features'].fillna('').astype(str)
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    tfidf.fit_transform(df['uses_features'] + ' ' + df['side_effect_features'])
+    return df
+
+
+def chunked(path):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from ingest import iter_documents, load_catalogue
+    df = load_catalogue(path)
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    tfidf.fit_transform(iter_documents(df))
+    return df
+
+
+def child(mode, path):
+    start = time.perf_counter()
+    df = {'legacy': legacy, 'chunked': chunked}[mode](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'mode': mode,
+        'rows': len(df),
+        'seconds': round(elapsed, 2),
+        'frame_mib': round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--source", default=os.path.join(ROOT, "data", "drugs.csv"))
+    parser.add_argument("--child", choices=['legacy', 'chunked'])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "drugs_scaled.csv")
+        make_synthetic(args.source, path, args.scale)
+        print(f"synthetic catalogue: {os.path.getsize(path) / 2**20:.1f} MiB")
+        for mode in ('legacy', 'chunked'):
+            subprocess.run([sys.executable, __file__, "--child", mode, "--path", path],
+                           check=True)
+
+
+if __name__ == "__main__":
+    main()
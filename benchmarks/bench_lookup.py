@@ -0,0 +1,59 @@
+"""Per-lookup latency of drug-name resolution: DataFrame mask scan vs hash index.
+
+Run from the repository root:
+
+    python benchmarks/bench_lookup.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recommender
+from model import DETAIL_COLUMNS
+from recommender import find_drug, get_drug_details
+
+df = recommender.current_model().df
+
+REPEAT = 2000
+
+
+def scan_details(drug_name):
+    """The previous get_drug_details: boolean mask over every row"""
+    exact_match = df[df['name'] == drug_name.lower().strip()]
+    return exact_match.iloc[0] if not exact_match.empty else None
+
+
+def scan_position(drug_name):
+    return df[df['name'] == drug_name.lower().strip()].index[0]
+
+
+def report(label, fn, names):
+    it = iter(names * (REPEAT // len(names) + 1))
+    per_call = timeit.timeit(lambda: fn(next(it)), number=REPEAT) / REPEAT
+    print(f"{label:<36} {per_call * 1e6:10.2f} us/lookup")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    names = [df['name'].iat[i].upper() for i in rng.integers(0, len(df), 100)]
+
+    for name in names:
+        expected = scan_details(name)
+        record = get_drug_details(name)
+        assert all(expected[col] == record[col] or (expected[col] != expected[col])
+                   for col in DETAIL_COLUMNS)
+        assert scan_position(name) == find_drug(name)
+
+    report("position: DataFrame mask", scan_position, names)
+    report("position: name index", find_drug, names)
+    report("details: DataFrame mask + Series", scan_details, names)
+    report("details: name index + record", get_drug_details, names)
+    report("miss: DataFrame mask", scan_details, ["no such drug"])
+    report("miss: name index", get_drug_details, ["no such drug"])
+
+
+if __name__ == "__main__":
+    main()
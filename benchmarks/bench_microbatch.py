@@ -0,0 +1,103 @@
+"""Micro-batched vs per-request recommendation scoring under concurrent load.
+
+Run from the repository root:
+
+    python benchmarks/bench_microbatch.py --threads 1 8 32 --requests 2000
+
+Each run starts `threads` closed-loop callers that share `requests`
+distinct drug names, so no request is served from the caches (they are
+also cleared before every run). "per_request" calls get_alternative_drugs
+directly; "batched" submits to a MicroBatcher and waits on the future.
+Throughput is requests per second of wall time; latencies are per call,
+including the batch window. "mixed" gives each request one of a few
+side-effect exclusions, so batches split into several filter groups.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recommender
+from microbatch import MicroBatcher
+
+
+def run(call, requests, n_threads):
+    """Drive `call(*request)` from n_threads threads; returns (wall seconds, latencies)"""
+    latencies = [[] for _ in range(n_threads)]
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker(slot):
+        barrier.wait()
+        for request in requests[slot::n_threads]:
+            start = time.perf_counter()
+            call(*request)
+            latencies[slot].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate([np.asarray(l) for l in latencies])
+
+
+def summary(wall, latencies):
+    us = latencies * 1e6
+    return {'throughput_rps': round(latencies.shape[0] / wall, 1),
+            'p50_us': round(float(np.percentile(us, 50)), 1),
+            'p99_us': round(float(np.percentile(us, 99)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=recommender.N_RECOMMENDATIONS)
+    args = parser.parse_args()
+
+    model = recommender.current_model()
+    rng = np.random.default_rng(0)
+    names = [model.name_array[i]
+             for i in rng.permutation(model.n_items)[:min(args.requests, model.n_items)]]
+    effects = model.df['side_effect_features'].str.split(',').explode().str.strip()
+    common_effects = effects[effects != ''].value_counts().index[:4].tolist()
+    mixes = {
+        'none': lambda i: None,
+        'side_effects': lambda i: common_effects[:2],
+        'mixed': lambda i: common_effects[i % 4:i % 4 + 1],
+    }
+
+    def clear_caches():
+        recommender.recommendation_cache.clear()
+        recommender.candidate_cache.clear()
+
+    report = {'drugs': model.n_items, 'requests': len(names), 'k': args.k,
+              'window_ms': args.window_ms, 'max_size': args.max_size, 'mixes': {}}
+    for mix, excluded_for in mixes.items():
+        requests = [(name, None, excluded_for(i), args.k) for i, name in enumerate(names)]
+        entry = report['mixes'][mix] = {}
+        for n_threads in args.threads:
+            clear_caches()
+            per_request = summary(*run(
+                lambda *r: recommender.get_alternative_drugs(*r, ranker="text"),
+                requests, n_threads))
+            clear_caches()
+            batcher = MicroBatcher(args.window_ms, args.max_size)
+            batched = summary(*run(lambda *r: batcher.submit(*r).result(), requests, n_threads))
+            stats = batcher.stats()
+            batched['mean_batch_size'] = round(stats['requests'] / max(stats['batches'], 1), 1)
+            entry[f'threads={n_threads}'] = {'per_request': per_request, 'batched': batched}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare the dense all-pairs cosine matrix against the sparse on-demand engine.
+
+Run from the repository root:
+
+    python benchmarks/bench_similarity.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from similarity import SimilarityEngine
+
+DATA_PATH = "data/drugs.csv"
+N_QUERIES = 200
+TOP_K = 50
+
+
+def build_matrix():
+    df = pd.read_csv(DATA_PATH)
+    text = (df['uses_features'].fillna('').astype(str) + ' ' +
+            df['side_effect_features'].fillna('').astype(str))
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    return tfidf.fit_transform(text)
+
+
+def measure(label, build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} build {elapsed:8.3f}s  peak {peak / 2**20:9.1f} MiB")
+    return result
+
+
+def time_queries(label, score_fn, queries):
+    start = time.perf_counter()
+    for idx in queries:
+        score_fn(idx)
+    per_query = (time.perf_counter() - start) / len(queries)
+    print(f"{label:<28} {per_query * 1e3:8.3f} ms/query")
+
+
+def top_k(row, k):
+    order = np.argsort(-row, kind='stable')
+    return order[:k + 1]
+
+
+def main():
+    tfidf_matrix = build_matrix()
+    n = tfidf_matrix.shape[0]
+    queries = np.random.default_rng(0).integers(0, n, N_QUERIES)
+
+    dense = measure("dense cosine_similarity", lambda: cosine_similarity(tfidf_matrix))
+    engine = measure("sparse on-demand engine", lambda: SimilarityEngine(tfidf_matrix))
+    measure(f"sparse top-{TOP_K} table", lambda: engine.build_neighbours(TOP_K))
+    print(f"{'neighbour table size':<28} "
+          f"{(engine.neighbour_indices.nbytes + engine.neighbour_scores.nbytes) / 2**20:8.1f} MiB "
+          f"(dense matrix {dense.nbytes / 2**20:.1f} MiB)")
+
+    time_queries("dense row lookup", lambda i: dense[i], queries)
+    time_queries("sparse row product", engine.scores, queries)
+    time_queries("neighbour table lookup", engine.neighbours, queries)
+
+    mismatched = 0
+    for idx in queries:
+        row = engine.scores(idx)
+        if not np.allclose(row, dense[idx]) or \
+                not np.array_equal(top_k(row, TOP_K), top_k(dense[idx], TOP_K)):
+            mismatched += 1
+        table_scores = engine.neighbours(idx)[1]
+        expected = np.sort(np.delete(dense[idx], idx))[::-1][:TOP_K]
+        if not np.allclose(table_scores, expected, atol=1e-6):
+            mismatched += 1
+    print(f"result mismatches: {mismatched} / {2 * len(queries)} checks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Substitute graph build cost and hybrid vs text-only recommendation latency.
+
+Run from the repository root:
+
+    python benchmarks/bench_substitutes.py --queries 500 --k 5
+
+Queries are drugs with at least one resolved substitute, with the caches
+cleared before each call. "graph only" is the share of hybrid queries that
+were answered from the graph without the similarity scan.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrumentation
+import recommender
+from substitutes import SubstituteGraph
+
+
+def per_query_us(fn, calls, before):
+    timings = []
+    for args in calls:
+        before()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    us = np.asarray(timings) * 1e6
+    return {'p50_us': round(float(np.percentile(us, 50)), 1),
+            'p99_us': round(float(np.percentile(us, 99)), 1)}
+
+
+def two_hop_loop(graph, idx):
+    """The same 2-hop expansion one neighbour list at a time"""
+    direct = set(graph.neighbours(idx).tolist())
+    two_hop = set()
+    for row in direct:
+        two_hop.update(graph.neighbours(row).tolist())
+    return direct, two_hop - direct - {idx}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=recommender.N_RECOMMENDATIONS)
+    args = parser.parse_args()
+
+    model = recommender.current_model()
+    start = time.perf_counter()
+    graph = SubstituteGraph(model.df['substitutes_features'], model.name_index)
+    build_seconds = time.perf_counter() - start
+
+    linked = np.flatnonzero(np.diff(graph.indptr) > 0)
+    rng = np.random.default_rng(0)
+    queries = rng.choice(linked, min(args.queries, linked.shape[0]), replace=False)
+    names = [model.name_array[i] for i in queries]
+
+    def clear_caches():
+        recommender.recommendation_cache.clear()
+        recommender.candidate_cache.clear()
+
+    expand = {}
+    for label, fn in (('vectorized', graph.candidates), ('python loop', lambda i: two_hop_loop(graph, i))):
+        expand[label] = per_query_us(fn, [(i,) for i in queries], lambda: None)
+
+    report = {'drugs': model.n_items, 'linked_drugs': int(linked.shape[0]),
+              'links': graph.n_edges, 'unresolved_names': len(graph.unresolved),
+              'unresolved_mentions': sum(graph.unresolved.values()),
+              'build_seconds': round(build_seconds, 3), 'two_hop_expansion': expand,
+              'queries': len(names), 'k': args.k, 'mixes': {}}
+    effects = model.df['side_effect_features'].str.split(',').explode().str.strip()
+    common_effects = effects[effects != ''].value_counts().index[:2].tolist()
+    for mix, excluded in (('none', None), ('side_effects', common_effects)):
+        text = per_query_us(recommender.get_alternative_drugs,
+                            [(name, None, excluded, args.k, 'text') for name in names], clear_caches)
+        instrumentation.reset()
+        hybrid = per_query_us(recommender.get_alternative_drugs,
+                              [(name, None, excluded, args.k, 'hybrid') for name in names],
+                              clear_caches)
+        merged = instrumentation.snapshot().get('recommend.graph_merge', {'count': 0})['count']
+
+        overlap, boosted = [], []
+        for idx, name in zip(queries, names):
+            text_names = {n for n, _ in recommender.get_alternative_drugs(
+                name, None, excluded, args.k, 'text')}
+            hybrid_names = [n for n, _ in recommender.get_alternative_drugs(
+                name, None, excluded, args.k, 'hybrid')]
+            direct, two_hop = graph.candidates(idx)
+            substitutes = {model.name_array[i] for i in np.concatenate([direct, two_hop])}
+            overlap.append(len(text_names.intersection(hybrid_names)) / args.k)
+            boosted.append(sum(n in substitutes for n in hybrid_names) / args.k)
+        report['mixes'][mix] = {
+            'text': text, 'hybrid': hybrid,
+            'graph_only': round(1 - merged / len(names), 3),
+            'overlap_with_text': round(float(np.mean(overlap)), 3),
+            'substitutes_in_results': round(float(np.mean(boosted)), 3),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Name-suggestion latency against catalogue size.
+
+Builds the name index over synthetic catalogues of unique names spliced
+from the heads and tails of real drug names, then times prefix, misspelt
+and mid-word queries against it:
+
+    python benchmarks/bench_suggest.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from name_search import NameSearch
+from synthetic import synthetic_names
+
+
+def misspell(name, rng):
+    """Drop, repeat or swap one character"""
+    i = int(rng.integers(1, max(2, len(name) - 1)))
+    edit = rng.integers(3)
+    if edit == 0:
+        return name[:i] + name[i + 1:]
+    if edit == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i:i + 1] + name[i - 1:i] + name[i + 1:]
+
+
+def percentiles(seconds):
+    us = np.asarray(seconds) * 1e6
+    return {'p50_us': round(float(np.percentile(us, 50)), 1),
+            'p99_us': round(float(np.percentile(us, 99)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/drugs.csv")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=8)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.data, usecols=['name'])['name'].str.lower().str.strip().tolist()
+    for size in args.sizes:
+        rng = np.random.default_rng(0)
+        names = synthetic_names(base, size, rng)
+        start = time.perf_counter()
+        index = NameSearch(names)
+        build_seconds = time.perf_counter() - start
+
+        picks = [names[i] for i in rng.integers(0, size, args.queries)]
+        queries = {
+            'prefix': [name[:3] for name in picks],
+            'misspelt': [misspell(name, rng) for name in picks],
+            'infix': [name[1:5] for name in picks],
+        }
+        report = {'names': size, 'build_seconds': round(build_seconds, 2),
+                  'index_mib': round(sum(a.nbytes for a in (index.codes, index.offsets,
+                                                           index.postings, index.trigram_counts))
+                                     / 2**20, 1)}
+        for query in queries['misspelt'][:100]:
+            index.suggest(query, args.limit)
+        for kind, batch in queries.items():
+            timings = []
+            for query in batch:
+                start = time.perf_counter()
+                index.suggest(query, args.limit)
+                timings.append(time.perf_counter() - start)
+            report[kind] = percentiles(timings)
+        # How often the intended name is suggested for a misspelling
+        hits = sum(name in index.suggest(query, args.limit)
+                   for name, query in zip(picks, queries['misspelt']))
+        report['misspelt_hit_rate'] = round(hits / len(picks), 3)
+        print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
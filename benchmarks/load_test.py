@@ -0,0 +1,86 @@
+"""Closed-loop load test for the JSON API of a running server.
+
+Start the server first, e.g. `gunicorn -c gunicorn.conf.py app:server`, then:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --concurrency 16 --requests 5000
+"""
+import argparse
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+SIDE_EFFECTS = ['Nausea', 'Headache', 'Diarrhea', 'Vomiting', 'Dizziness']
+
+
+def make_paths(names, n, seed):
+    """A mix of detail, unfiltered, price-filtered and side-effect-filtered requests"""
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(n):
+        name = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.25:
+            paths.append(f"/api/drugs/{urllib.parse.quote(name)}")
+            continue
+        params = [('drug', name)]
+        if kind < 0.6:
+            params += [('min_price', 0), ('max_price', rng.choice([500, 2000, 30000]))]
+        elif kind < 0.85:
+            params += [('exclude', e) for e in rng.sample(SIDE_EFFECTS, rng.randint(1, 3))]
+        paths.append("/api/recommendations?" + urllib.parse.urlencode(params))
+    return paths
+
+
+def fetch(url):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except urllib.error.URLError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--data", default="data/drugs.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = pd.read_csv(args.data, usecols=['name'])['name'].str.lower().str.strip().tolist()
+    urls = [args.url.rstrip('/') + path for path in make_paths(names, args.requests, args.seed)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1e3
+
+    print(json.dumps({
+        'requests': len(results),
+        'errors': errors,
+        'concurrency': args.concurrency,
+        'rps': round(len(results) / elapsed, 1),
+        'p50_ms': round(pct(50), 2),
+        'p99_ms': round(pct(99), 2),
+        'max_ms': round(latencies[-1] * 1e3, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
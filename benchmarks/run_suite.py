@@ -0,0 +1,212 @@
+"""Reproducible benchmark suite over synthetic catalogues at several scales.
+
+    python benchmarks/run_suite.py --sizes 10000 100000 1000000 --out results.json
+    python benchmarks/run_suite.py --compare before.json after.json
+
+For each size a catalogue shaped like data/drugs.csv is generated (see
+synthetic.py) into a scratch directory, then fresh subprocesses measure:
+
+- build: `import recommender` with no artifact, i.e. TF-IDF fit, similarity
+  index build and artifact write (seconds, peak RSS)
+- import: `import recommender` again, loading the memory-mapped artifact
+  (cold import seconds, RSS after import)
+- get_drug_details latency for hits and misses
+- get_alternative_drugs latency per filter mix, with the caches cleared
+  before every query (cold) and once they hold every query (warm)
+
+Latencies are in microseconds. The JSON has stable keys so two runs can be
+compared with --compare. The exact backend's neighbour table costs O(N^2) to
+build, so with --backend auto sizes above EXACT_MAX_ROWS use the ANN index.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from synthetic import write_catalogue
+
+EXACT_MAX_ROWS = 100_000
+SEED = 0
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _latency(seconds):
+    us = np.asarray(seconds) * 1e6
+    return {'mean_us': round(float(us.mean()), 1),
+            **{f'p{q}_us': round(float(np.percentile(us, q)), 1) for q in (50, 95, 99)}}
+
+
+def _import_recommender():
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import recommender
+    return recommender, time.perf_counter() - start
+
+
+def child_build():
+    _, seconds = _import_recommender()
+    artifact_bytes = sum(os.path.getsize(os.path.join(dirpath, f))
+                         for dirpath, _, files in os.walk("artifacts") for f in files)
+    return {'seconds': round(seconds, 3), 'peak_rss_mib': _peak_rss_mib(),
+            'artifact_mib': round(artifact_bytes / 2**20, 1)}
+
+
+def _timed_calls(fn, args_list, before=None):
+    timings = []
+    for args in args_list:
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def child_query(n_queries):
+    recommender, import_seconds = _import_recommender()
+    report = {'import': {'seconds': round(import_seconds, 3), 'rss_mib': _peak_rss_mib()}}
+    model = recommender.current_model()
+    rng = np.random.default_rng(SEED)
+    names = [model.name_array[i] for i in rng.integers(0, model.n_items, n_queries)]
+
+    report['details'] = {
+        'hit': _latency(_timed_calls(recommender.get_drug_details, [(n,) for n in names])),
+        'miss': _latency(_timed_calls(recommender.get_drug_details,
+                                      [(f"{n} unknown",) for n in names])),
+    }
+
+    known_prices = model.sorted_prices
+    price_range = ((float(np.percentile(known_prices, 25)), float(np.percentile(known_prices, 75)))
+                   if known_prices.shape[0] else (0, 2000))
+    effects = model.df['side_effect_features'].str.split(',').explode().str.strip()
+    common_effects = effects[effects != ''].value_counts().index[:2].tolist()
+    mixes = {
+        'none': (None, None),
+        'price': (price_range, None),
+        'side_effects': (None, common_effects),
+        'price+side_effects': (price_range, common_effects),
+    }
+
+    def clear_caches():
+        recommender.recommendation_cache.clear()
+        recommender.candidate_cache.clear()
+
+    report['recommend'] = {}
+    for mix, (prices, excluded) in mixes.items():
+        calls = [(name, prices, excluded) for name in names]
+        cold = _timed_calls(recommender.get_alternative_drugs, calls, before=clear_caches)
+        # One untimed pass fills the caches, the second is served from them
+        _timed_calls(recommender.get_alternative_drugs, calls)
+        warm = _timed_calls(recommender.get_alternative_drugs, calls)
+        report['recommend'][mix] = {'cold': _latency(cold), 'warm': _latency(warm)}
+    report['query_peak_rss_mib'] = _peak_rss_mib()
+    return report
+
+
+def run_child(phase, workdir, backend, n_queries):
+    env = dict(os.environ, RECOMMENDER_BACKEND=backend, RECOMMENDER_RELOAD_SECONDS="0")
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", phase,
+                             "--queries", str(n_queries)],
+                            cwd=workdir, env=env, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_size(rows, backend, n_queries, scratch):
+    if backend == 'auto':
+        backend = 'exact' if rows <= EXACT_MAX_ROWS else 'ann'
+    workdir = os.path.join(scratch, str(rows))
+    os.makedirs(os.path.join(workdir, "data"))
+    start = time.perf_counter()
+    write_catalogue(os.path.join(workdir, "data", "drugs.csv"), rows, SEED)
+    generate_seconds = time.perf_counter() - start
+
+    result = {'rows': rows, 'backend': backend, 'generate_seconds': round(generate_seconds, 2),
+              'build': run_child('build', workdir, backend, n_queries)}
+    result.update(run_child('query', workdir, backend, n_queries))
+    return result
+
+
+def metadata(args):
+    import numpy, pandas, scipy, sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': numpy.__version__, 'pandas': pandas.__version__,
+            'scipy': scipy.__version__, 'sklearn': sklearn.__version__,
+            'seed': SEED, 'queries': args.queries,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def _flatten(value, prefix=''):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(old_path, new_path):
+    """Print every numeric metric present in both runs with its relative change"""
+    def load(path):
+        with open(path) as f:
+            results = json.load(f)['results']
+        return dict(pair for result in results
+                    for pair in _flatten(result, f"rows={result['rows']}"))
+    old, new = load(old_path), load(new_path)
+    for key in old:
+        if key in new and not key.endswith('.rows'):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else float('nan')
+            print(f"{key:<60} {old[key]:>12} {new[key]:>12} {change:+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=['auto', 'exact', 'ann'], default='auto')
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument("--child", choices=['build', 'query'])
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        report = child_build() if args.child == 'build' else child_query(args.queries)
+        print(json.dumps(report))
+        return
+
+    report = {'meta': metadata(args), 'results': []}
+    with tempfile.TemporaryDirectory() as scratch:
+        for rows in args.sizes:
+            print(f"benchmarking {rows} rows...", file=sys.stderr)
+            report['results'].append(run_size(rows, args.backend, args.queries, scratch))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Synthetic catalogues shaped like data/drugs.csv, for benchmarks at any scale.
+
+    python benchmarks/synthetic.py --rows 100000 --out /tmp/drugs_100k.csv
+
+Columns, class/use combinations, side-effect vocabulary and term counts,
+price sparsity and substitute-list lengths are all sampled from the real
+catalogue, and names are unique splices of real names. Output is fully
+determined by the source file, the row count and the seed.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "data", "drugs.csv")
+
+# Columns copied together from one sampled real row, so classes and uses stay consistent
+JOINT_COLUMNS = ['Chemical Class', 'Habit Forming', 'Therapeutic Class', 'Action Class',
+                 'uses_features']
+# Share of rows whose side effects are a fresh draw from the vocabulary instead of
+# a real row's list
+FRESH_SIDE_EFFECTS = 0.5
+
+
+def synthetic_names(base, size, rng):
+    """`size` unique names: the real ones, then splices of a real head and tail"""
+    base = list(dict.fromkeys(base))
+    names = set(base[:size])
+    while len(names) < size:
+        heads = rng.choice(base, size)
+        tails = rng.choice(base, size)
+        cuts = rng.integers(2, 5, size)
+        names.update(head[:cut] + tail[cut:] for head, tail, cut in zip(heads, tails, cuts))
+    names = sorted(names)[:size]
+    return [names[i] for i in rng.permutation(size)]
+
+
+def _split(text):
+    return [term.strip() for term in str(text).split(',') if term.strip()]
+
+
+def generate(rows, seed=0, source=SOURCE):
+    """A DataFrame of `rows` synthetic drugs with the columns of `source`"""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(source)
+    base['name'] = base['name'].str.lower().str.strip()
+    names = synthetic_names(base['name'].tolist(), rows, rng)
+
+    picks = rng.integers(0, len(base), rows)
+    df = pd.DataFrame({'id': np.arange(rows), 'name': names})
+    for col in JOINT_COLUMNS:
+        df[col] = base[col].to_numpy()[picks]
+    df['Main Array'] = [f"['{name}']" for name in names]
+
+    # Prices: keep the real share of unknown (-1) prices; jitter real known prices
+    prices = base['Price'].fillna(-1).to_numpy()
+    known = prices[prices != -1]
+    price = np.full(rows, -1.0)
+    if known.shape[0]:
+        has_price = rng.random(rows) < known.shape[0] / prices.shape[0]
+        price[has_price] = np.round(rng.choice(known, has_price.sum())
+                                    * rng.lognormal(0, 0.25, has_price.sum()), 2)
+    df['Price'] = price
+
+    # Side effects: half copied from real rows, half drawn from the term frequencies
+    real_effects = base['side_effect_features'].fillna('').to_numpy()[picks]
+    term_lists = [_split(text) for text in base['side_effect_features'].fillna('')]
+    vocabulary = pd.Series([t for terms in term_lists for t in terms]).value_counts()
+    terms, weights = vocabulary.index.to_numpy(), vocabulary.to_numpy() / vocabulary.sum()
+    counts = np.array([len(terms_) for terms_ in term_lists])[picks]
+    fresh = np.flatnonzero((rng.random(rows) < FRESH_SIDE_EFFECTS) & (counts > 0))
+    draws = terms[np.searchsorted(np.cumsum(weights), rng.random(counts[fresh].sum()),
+                                  side='right').clip(max=terms.shape[0] - 1)]
+    effects = real_effects.astype(object)
+    ends = np.cumsum(counts[fresh])
+    for i, end, n in zip(fresh, ends, counts[fresh]):
+        # Repeated draws collapse, as a drug lists each effect once
+        effects[i] = ', '.join(dict.fromkeys(draws[end - n:end]))
+    df['side_effect_features'] = effects
+
+    # Substitutes: real share of missing lists and real list lengths, over synthetic names
+    substitute_counts = np.array([len(_split(text)) if isinstance(text, str) else 0
+                                  for text in base['substitutes_features']])
+    lengths = substitute_counts[rng.integers(0, len(base), rows)]
+    name_array = np.array(names, dtype=object)
+    df['substitutes_features'] = [', '.join(name_array[rng.integers(0, rows, n)]) if n else None
+                                  for n in lengths]
+    return df[base.columns]
+
+
+def write_catalogue(path, rows, seed=0, source=SOURCE):
+    generate(rows, seed, source).to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--source", default=SOURCE)
+    args = parser.parse_args()
+    write_catalogue(args.out, args.rows, args.seed, args.source)
+
+
+if __name__ == "__main__":
+    main()
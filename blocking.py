@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+# Catalogue columns a query can be blocked on, by blocking mode name
+BLOCKING_COLUMNS = {'therapeutic': 'Therapeutic Class', 'action': 'Action Class'}
+# Blocks smaller than this are searched together with their nearest classes
+MIN_BLOCK_ROWS = 256
+
+
+def class_codes(values):
+    """Integer class codes for a column of class labels; -1 where the class is missing"""
+    return np.asarray(pd.Categorical(values).codes, dtype=np.int64)
+
+
+def block_layout(matrix, codes):
+    """(rows, offsets, blocked) for the integer class `codes` of `matrix`'s rows.
+
+    `rows` lists the rows that have a class in block order, block b being
+    rows[offsets[b]:offsets[b + 1]], and `blocked` is matrix[rows]. The
+    artifact stores this, so loaded ClassBlocks share its pages.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    n_blocks = int(codes.max()) + 1 if codes.shape[0] else 0
+    classified = np.flatnonzero(codes >= 0)
+    rows = classified[np.argsort(codes[classified], kind='stable')]
+    offsets = np.zeros(n_blocks + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[classified], minlength=n_blocks), out=offsets[1:])
+    return rows, offsets, matrix[rows]
+
+
+def _row_slice(matrix, start, stop):
+    # CSR rows start:stop as views of the parent arrays. Slicing, and the constructor
+    # given small views of large arrays, would copy them out of a memory-mapped artifact.
+    block = csr_matrix((stop - start, matrix.shape[1]), dtype=matrix.dtype)
+    indptr = matrix.indptr[start:stop + 1]
+    block.indptr = indptr - indptr[0]
+    block.indices = matrix.indices[indptr[0]:indptr[-1]]
+    block.data = matrix.data[indptr[0]:indptr[-1]]
+    return block
+
+
+class ClassBlocks:
+    """Rows partitioned by an integer-coded class, each block a contiguous TF-IDF sub-matrix.
+
+    A query scores only its own class's block instead of the whole
+    catalogue. Classes with fewer than `min_rows` drugs are widened with
+    the classes whose centroids (mean TF-IDF rows) are most similar,
+    until the search set reaches `min_rows`. Rows with no class belong
+    to no block; callers fall back to a full scan for them. `layout` is a
+    precomputed block_layout(matrix, codes); without one the rows are
+    copied into block order here.
+    """
+
+    def __init__(self, matrix, codes, min_rows=MIN_BLOCK_ROWS, layout=None):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.rows, self.offsets, blocked = (layout if layout is not None
+                                            else block_layout(matrix, self.codes))
+        n_blocks = self.offsets.shape[0] - 1
+        self.blocks = [_row_slice(blocked, self.offsets[b], self.offsets[b + 1])
+                       for b in range(n_blocks)]
+
+        # Sparse block sums, so no dense n_blocks x vocabulary array is needed
+        sizes = np.diff(self.offsets)
+        membership = csr_matrix((np.ones(blocked.shape[0]),
+                                 (np.repeat(np.arange(n_blocks), sizes),
+                                  np.arange(blocked.shape[0]))),
+                                shape=(n_blocks, blocked.shape[0]))
+        centroids = membership @ blocked
+        norms = np.sqrt(np.asarray(centroids.multiply(centroids).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        closeness = (centroids @ centroids.T).toarray() / np.outer(norms, norms)
+        self.search = []
+        for b in range(n_blocks):
+            # Own block first, then the nearest classes until the set is big enough
+            order = np.argsort(-closeness[b], kind='stable')
+            order = np.concatenate(([b], order[order != b]))
+            covered = np.cumsum(sizes[order])
+            n_used = int(np.searchsorted(covered, min(min_rows, covered[-1]))) + 1
+            self.search.append(order[:n_used])
+
+    @property
+    def n_blocks(self):
+        return len(self.blocks)
+
+    def search_set(self, idx):
+        """Block ids searched for row `idx`, or None if the row has no class"""
+        code = self.codes[idx]
+        return self.search[code] if code >= 0 else None
+
+    def scores(self, idx, query):
+        """(row ids, similarities) over the blocks searched for row `idx`.
+
+        `query` is row `idx` as a dense vector. Returns None if the row has
+        no class.
+        """
+        search = self.search_set(idx)
+        if search is None:
+            return None
+        rows = np.concatenate([self.rows[self.offsets[b]:self.offsets[b + 1]] for b in search])
+        scores = np.concatenate([self.blocks[b] @ query for b in search])
+        return rows, scores
@@ -0,0 +1,12 @@
+# Production serving: gunicorn -c gunicorn.conf.py app:server
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+# Threaded workers: the model is read-only and the caches are lock-protected
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("THREADS", 4))
+# Load the model once in the master; forked workers share its memory-mapped pages
+preload_app = True
+timeout = 30
@@ -0,0 +1,57 @@
+import pandas as pd
+
+# Only the columns the recommender reads; `id` and `Main Array` are never used
+TEXT_COLUMNS = ['name', 'uses_features', 'side_effect_features', 'substitutes_features']
+CATEGORY_COLUMNS = ['Chemical Class', 'Habit Forming', 'Therapeutic Class', 'Action Class']
+USE_COLUMNS = TEXT_COLUMNS + CATEGORY_COLUMNS + ['Price']
+CHUNK_ROWS = 50_000
+
+
+def prepare_frame(chunk):
+    """Normalise raw catalogue rows in place: lower-cased names, filled text, compact dtypes"""
+    for col in USE_COLUMNS:
+        if col not in chunk:
+            chunk[col] = (-1 if col == 'Price'
+                          else pd.Series(None, index=chunk.index, dtype='str'))
+    chunk['name'] = chunk['name'].astype('str').str.lower().str.strip()
+    chunk['Price'] = chunk['Price'].astype('float32')
+    chunk['uses_features'] = chunk['uses_features'].fillna('')
+    chunk['side_effect_features'] = chunk['side_effect_features'].fillna('')
+    chunk['Price'] = chunk['Price'].fillna(-1)
+    for col in CATEGORY_COLUMNS:
+        chunk[col] = chunk[col].astype('category')
+    return chunk
+
+
+def load_catalogue(path, chunksize=CHUNK_ROWS):
+    """Read the drug catalogue in chunks with compact dtypes.
+
+    Class columns become categoricals and Price is float32; each chunk is
+    normalised before the next is read, so the raw object columns of the
+    whole file are never held at once.
+    """
+    dtypes = {col: 'str' for col in TEXT_COLUMNS + CATEGORY_COLUMNS}
+    dtypes['Price'] = 'float32'
+    chunks = [prepare_frame(chunk) for chunk in
+              pd.read_csv(path, usecols=USE_COLUMNS, dtype=dtypes, chunksize=chunksize)]
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=dtypes[col]) for col in USE_COLUMNS})
+    return concat_frames(chunks)
+
+
+def concat_frames(frames):
+    """Concatenate prepared frames, keeping the class columns categorical"""
+    # Frames carry different category sets; merge them first, or concat falls back to objects
+    categories = {col: frames[0][col].cat.categories.append(
+                      [frame[col].cat.categories for frame in frames[1:]]).unique()
+                  for col in CATEGORY_COLUMNS}
+    frames = [frame.assign(**{col: frame[col].cat.set_categories(categories[col])
+                              for col in CATEGORY_COLUMNS})
+              for frame in frames]
+    return pd.concat([frame[USE_COLUMNS] for frame in frames], ignore_index=True)
+
+
+def iter_documents(data):
+    """Yield the text indexed for each drug, without building a concatenated Series"""
+    for uses, side_effects in zip(data['uses_features'], data['side_effect_features']):
+        yield uses + ' ' + side_effects
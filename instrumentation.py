@@ -0,0 +1,178 @@
+"""Timing spans with in-process latency summaries and an opt-in slow-request profiler.
+
+    with span("recommend.rank"):
+        ...
+
+Every span name keeps a count, a running sum, an error count and a window
+of its most recent durations, from which p50/p95/p99 are read. Spans are
+recorded per occurrence, so a stage entered twice in one request counts
+twice. The summaries are rendered in Prometheus text format by
+`prometheus_lines` and served from the app's /metrics route.
+"""
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+# Recent durations kept per span for the quantiles
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Profile this fraction of HTTP requests and keep the stats of those slower than
+# PROFILE_SLOW_MS; off unless RECOMMENDER_PROFILE_SAMPLE is set
+PROFILE_SAMPLE = float(os.environ.get("RECOMMENDER_PROFILE_SAMPLE", 0))
+PROFILE_SLOW_MS = float(os.environ.get("RECOMMENDER_PROFILE_SLOW_MS", 250))
+PROFILE_DIR = os.environ.get("RECOMMENDER_PROFILE_DIR", "profiles")
+
+
+class LatencyStats:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def summary(self):
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        quantiles = (np.quantile(values, QUANTILES) if values.shape[0]
+                     else [float('nan')] * len(QUANTILES))
+        return {'count': self.count, 'sum': self.total, 'errors': self.errors,
+                **{f'p{round(q * 100)}': float(v) for q, v in zip(QUANTILES, quantiles)}}
+
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def record(name, seconds, error=False):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = LatencyStats()
+        stats.samples.append(seconds)
+        stats.count += 1
+        stats.total += seconds
+        stats.errors += error
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block under `name`; exceptions are counted and re-raised"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, error)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    """{span name: {'count', 'sum', 'errors', 'p50', 'p95', 'p99'}} in seconds"""
+    with _lock:
+        return {name: stats.summary() for name, stats in sorted(_stats.items())}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def prometheus_lines(metric="recommender_span_seconds"):
+    """Span summaries as Prometheus text exposition lines"""
+    spans = snapshot()
+    lines = [f"# TYPE {metric} summary"]
+    for name, stats in spans.items():
+        for q in QUANTILES:
+            lines.append(f'{metric}{{span="{name}",quantile="{q}"}} '
+                         f'{stats[f"p{round(q * 100)}"]}')
+        lines.append(f'{metric}_sum{{span="{name}"}} {stats["sum"]}')
+        lines.append(f'{metric}_count{{span="{name}"}} {stats["count"]}')
+    errors = metric.replace("_seconds", "_errors_total")
+    lines.append(f"# TYPE {errors} counter")
+    lines.extend(f'{errors}{{span="{name}"}} {stats["errors"]}' for name, stats in spans.items())
+    return lines
+
+
+class SlowRequestProfiler:
+    """Runs cProfile on a random sample of requests and dumps the slow ones.
+
+    Stats are written as `<unix ms>-<label>.prof` under `out_dir`, to be read
+    with pstats or snakeviz. cProfile only sees the thread that started it,
+    so concurrent requests are profiled independently.
+    """
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE, slow_ms=PROFILE_SLOW_MS, out_dir=PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.out_dir = out_dir
+        self.dumped = 0
+
+    def start(self):
+        """A running profiler if this request is sampled, else None"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return None
+        return profiler
+
+    def finish(self, profiler, seconds, label):
+        """Stop `profiler`; returns the dump path if the request was slow enough to keep"""
+        profiler.disable()
+        if seconds * 1e3 < self.slow_ms:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'request'
+        path = os.path.join(self.out_dir, f"{int(time.time() * 1e3)}-{slug}.prof")
+        profiler.dump_stats(path)
+        self.dumped += 1
+        return path
+
+
+profiler = SlowRequestProfiler()
+
+
+def instrument_server(server):
+    """Time every request of a Flask `server` and feed sampled ones to the profiler"""
+    from flask import g, request
+
+    @server.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_profiler = profiler.start()
+
+    @server.teardown_request
+    def _finish_request_timer(exc):
+        started = g.pop('request_started', None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        record(f"http {rule}", seconds, exc is not None)
+        request_profiler = g.pop('request_profiler', None)
+        if request_profiler is not None:
+            profiler.finish(request_profiler, seconds, f"{request.method} {request.path}")
@@ -1,7 +1,11 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 
-def create_layout():
+def price_marks(price_min, price_max):
+    step_size = max(1, (price_max - price_min) // 4)
+    return {i: str(i) for i in range(price_min, price_max + 1, step_size)}
+
+def create_layout(price_min=0, price_max=2000):
     return dbc.Container(
         fluid=True,
         children=[
@@ -24,7 +28,8 @@ def create_layout():
                     dbc.Input(
                         id="drug-input",
                         type="text",
-                        placeholder="Enter exact drug name...",
+                        placeholder="Start typing a drug name...",
+                        autocomplete="off",
                         className="mb-3",
                         style={
                             'width': '100%',
@@ -37,6 +42,15 @@ def create_layout():
                         persistence=True,
                         persistence_type='session'
                     ),
+                    # Name of the drug currently shown, or None; drives the results visibility
+                    dcc.Store(id="selected-drug"),
+                    dcc.Store(id="price-range", data=[0, 2000]),
+                    # Name suggestions for partial or misspelt input
+                    dbc.ListGroup(
+                        id="drug-suggestions",
+                        className="mb-3",
+                        style={'maxHeight': '260px', 'overflowY': 'auto'}
+                    ),
                     html.Div(
                         id="output-container",
                         className="mb-2 text-center",
@@ -86,13 +100,16 @@ def create_layout():
                                         ]),
                                         dcc.RangeSlider(
                                             id="price-range-slider",
-                                            min=0,
-                                            max=2000,
+                                            min=price_min,
+                                            max=price_max,
                                             step=10,
                                             value=[0, 2000],
-                                            marks={i: str(i) for i in range(0, 2001, 500)},
+                                            marks=price_marks(price_min, price_max),
                                             tooltip={"placement": "bottom", "always_visible": True},
-                                            disabled=False
+                                            # Moves live while dragging; app.py debounces the value
+                                            # into the price-range store the server listens to
+                                            updatemode='drag',
+                                            disabled=True
                                         ),
                                         # Price display under the slider in a light blue semi-transparent box
                                         html.Div(
@@ -106,7 +123,7 @@ def create_layout():
                                                 'fontSize': '1.2rem'
                                             }
                                         )
-                                    ], id="price-filter-col")
+                                    ], id="price-filter-col", style={'opacity': 0.5})
                                 ], width=6),
                                 dbc.Col([
                                     html.H5("Exclude Side Effects", className="text-center"),
@@ -0,0 +1,146 @@
+"""Micro-batching: coalesce concurrent recommendation requests into batched scoring.
+
+Callers submit requests from their own threads (Dash callbacks, API
+routes) and get a concurrent.futures.Future back. One worker thread
+collects requests until BATCH_WINDOW_MS has passed since the first one
+or BATCH_MAX_SIZE are queued, groups them by (k, filters), and scores
+each group with recommender.get_alternatives_batch. That answers most
+queries from their first ranked window and scores the rest as one sparse
+matrix product with a row-wise top-k, returning exactly what
+get_alternative_drugs would, so both share the recommendation cache.
+Identical requests in a batch are scored once.
+
+recommend() batches only filtered requests for the text ranker without
+class blocking; anything else, and everything when BATCH_WINDOW_MS is 0,
+goes straight to get_alternative_drugs. Batching trades the window's
+added latency for throughput and tail latency when many filtered
+requests arrive together (see benchmarks/bench_microbatch.py).
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import recommender
+from instrumentation import record, span
+
+logger = logging.getLogger(__name__)
+
+# How long the worker waits for more requests after the first; 0 disables batching
+BATCH_WINDOW_MS = float(os.environ.get("RECOMMENDER_BATCH_WINDOW_MS", 0))
+# Requests scored together at most
+BATCH_MAX_SIZE = int(os.environ.get("RECOMMENDER_BATCH_MAX_SIZE", 64))
+
+
+class MicroBatcher:
+    """Single worker thread that scores queued requests in batches.
+
+    The worker starts on the first submit() and again after a fork, so a
+    batcher created before gunicorn forks its workers runs in each of them.
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_size=BATCH_MAX_SIZE):
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(self._queue,), daemon=True,
+                                 name="recommendation-batcher").start()
+                self._pid = os.getpid()
+
+    def submit(self, drug_name, price_range=None, excluded_side_effects=None,
+               k=recommender.N_RECOMMENDATIONS):
+        """Future resolving to what get_alternative_drugs(..., ranker="text") returns"""
+        future = Future()
+        model = recommender.current_model()
+        idx = model.find(drug_name)
+        if idx is None:
+            future.set_result([])
+            return future
+        key = recommender.recommendation_key(model, idx, k, "text", None, price_range,
+                                             excluded_side_effects)
+        cached = recommender.recommendation_cache.get(key)
+        if cached is not None:
+            future.set_result([list(rec) for rec in cached])
+            return future
+        self._ensure_worker()
+        self._queue.put((key, model.name_array[idx], price_range, excluded_side_effects,
+                         future, time.perf_counter()))
+        return future
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        now = time.perf_counter()
+        for *_, queued in batch:
+            record("microbatch.wait", now - queued)
+        self.batches += 1
+        self.requests += len(batch)
+
+        # (k, filters) -> {cache key: (name, futures)}; the cache key's tail is k and filters
+        groups = {}
+        for key, name, price_range, excluded, future, _ in batch:
+            group = groups.setdefault(key[2:], (price_range, excluded, {}))[2]
+            group.setdefault(key, (name, []))[1].append(future)
+
+        with span("microbatch.score"):
+            for (k, *_), (price_range, excluded, requests) in groups.items():
+                keys = list(requests)
+                try:
+                    results = recommender.get_alternatives_batch(
+                        [requests[key][0] for key in keys], k, price_range, excluded)
+                except Exception as exc:
+                    logger.exception("Batched recommendation failed")
+                    for key in keys:
+                        for future in requests[key][1]:
+                            future.set_exception(exc)
+                    continue
+                for key, result in zip(keys, results):
+                    recommender.recommendation_cache.put(key, tuple(map(tuple, result)))
+                    for future in requests[key][1]:
+                        future.set_result([list(rec) for rec in result])
+
+    def stats(self):
+        return {'batches': self.batches, 'requests': self.requests}
+
+
+batcher = MicroBatcher() if BATCH_WINDOW_MS > 0 else None
+
+
+def recommend(drug_name, price_range=None, excluded_side_effects=None,
+              k=recommender.N_RECOMMENDATIONS, ranker=None, blocking=None):
+    """get_alternative_drugs, coalesced with concurrent requests when batching is enabled"""
+    # Unfiltered requests are a neighbour-table lookup with nothing to amortise
+    if (batcher is None or (ranker or recommender.RANKER) != "text" or blocking is not None
+            or not (price_range or excluded_side_effects)):
+        return recommender.get_alternative_drugs(drug_name, price_range, excluded_side_effects,
+                                                 k, ranker, blocking)
+    try:
+        return batcher.submit(drug_name, price_range, excluded_side_effects, k).result()
+    except Exception:
+        # Already logged by the worker; fail like get_alternative_drugs does
+        return []
@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+
+from blocking import BLOCKING_COLUMNS, ClassBlocks, class_codes
+from name_search import NameSearch
+from side_effects import SideEffectIndex
+from substitutes import SubstituteGraph
+
+# Columns returned by Model.record, so detail lookups skip pandas row access
+DETAIL_COLUMNS = ['name', 'Chemical Class', 'Habit Forming', 'Therapeutic Class',
+                  'Action Class', 'Price', 'uses_features', 'side_effect_features',
+                  'substitutes_features']
+
+
+class Model:
+    """One immutable version of the catalogue and everything derived from it.
+
+    The recommender swaps whole Model objects, so a request that takes a
+    reference at its start sees a consistent catalogue, TF-IDF model and
+    lookup indices even if a newer version is published meanwhile.
+    """
+
+    def __init__(self, df, tfidf, engine, version=0):
+        self.df = df
+        self.tfidf = tfidf
+        self.engine = engine
+        self.version = version
+        # Name -> row position, built once so lookups never scan the DataFrame
+        self.name_index = {name: pos for pos, name in enumerate(df['name'])}
+        self.detail_arrays = [df[col].to_numpy() for col in DETAIL_COLUMNS]
+        self.name_array = df['name'].to_numpy()
+        self.price_array = df['Price'].to_numpy()
+        # Rows with a known price, sorted by price, for range queries
+        price_order = np.flatnonzero(self.price_array != -1)
+        self.price_order = price_order[np.argsort(self.price_array[price_order], kind='stable')]
+        self.sorted_prices = self.price_array[self.price_order]
+        # Side effects parsed once into per-drug bitsets for exact exclusion filtering
+        self.side_effect_index = SideEffectIndex(df['side_effect_features'])
+        # Prefix and trigram index behind the name suggestions
+        self.name_search = NameSearch(self.name_array)
+        # substitutes_features resolved once into a CSR graph over row positions
+        self.substitute_graph = SubstituteGraph(df['substitutes_features'], self.name_index)
+        # Class blocking is opt-in per request, so its indices are built on first use
+        self._class_blocks = {}
+        self._class_blocks_lock = threading.Lock()
+
+    @property
+    def n_items(self):
+        return len(self.name_array)
+
+    def find(self, drug_name):
+        """Row position of a drug by exact (case-insensitive) name, or None"""
+        if not drug_name:
+            return None
+        return self.name_index.get(drug_name.lower().strip())
+
+    def record(self, idx):
+        """Detail columns of the drug at row position `idx` as a plain dict"""
+        return {col: values[idx] for col, values in zip(DETAIL_COLUMNS, self.detail_arrays)}
+
+    def _price_bounds(self, min_price, max_price):
+        # Prices are stored as float32 (22.51 becomes 22.5100002); rounding the bounds
+        # the same way keeps drugs priced exactly at a bound inside the range
+        dtype = self.price_array.dtype.type
+        return dtype(min_price), dtype(max_price)
+
+    def rows_in_price_range(self, min_price, max_price):
+        """Row positions with a known price inside [min_price, max_price], in row order"""
+        min_price, max_price = self._price_bounds(min_price, max_price)
+        lo = np.searchsorted(self.sorted_prices, min_price, side='left')
+        hi = np.searchsorted(self.sorted_prices, max_price, side='right')
+        return np.sort(self.price_order[lo:hi])
+
+    def class_blocks(self, mode):
+        """ClassBlocks over the column of blocking `mode` ('therapeutic' or 'action').
+
+        Built once per model on first use, from the artifact's memory-mapped
+        block layout when the engine has one.
+        """
+        blocks = self._class_blocks.get(mode)
+        if blocks is None:
+            with self._class_blocks_lock:
+                blocks = self._class_blocks.get(mode)
+                if blocks is None:
+                    blocks = ClassBlocks(self.engine.matrix,
+                                         class_codes(self.df[BLOCKING_COLUMNS[mode]]),
+                                         layout=self.engine.class_layouts.get(mode))
+                    self._class_blocks[mode] = blocks
+        return blocks
+
+    def filter_mask(self, indices, price_range=None, excluded_side_effects=None):
+        """Boolean mask of the rows in `indices` that pass the price and side-effect filters"""
+        keep = np.ones(indices.shape[0], dtype=bool)
+        if price_range:
+            min_price, max_price = self._price_bounds(*price_range)
+            prices = self.price_array[indices]
+            keep &= (prices >= min_price) & (prices <= max_price) & (prices != -1)
+        if excluded_side_effects:
+            keep &= ~self.side_effect_index.excludes(indices, excluded_side_effects)
+        return keep
@@ -0,0 +1,111 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from similarity import top_k
+
+# Trigram postings scanned per fuzzy query; the rarest trigrams are used first
+FUZZY_POSTINGS_BUDGET = 8192
+
+
+def _trigram_codes(names):
+    """(row, code) pairs for the byte trigrams of ' name ' across `names`.
+
+    Names are UTF-8 encoded and padded with one space on each side so the
+    first and last letters count; each trigram is packed into a uint32.
+    """
+    encoded = np.array([f" {name} ".encode() for name in names], dtype=bytes)
+    width = encoded.dtype.itemsize
+    chars = encoded.view(np.uint8).reshape(len(names), width).astype(np.uint32)
+    lengths = np.char.str_len(encoded)
+    codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+    valid = np.arange(width - 2) < (lengths - 2)[:, None]
+    rows = np.broadcast_to(np.arange(len(names))[:, None], codes.shape)
+    return rows[valid], codes[valid]
+
+
+def _sorted_unique(values):
+    """np.unique via an explicit sort; numpy's hash-based unique is far slower on uint64"""
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+class NameSearch:
+    """Typeahead over drug names: sorted-array prefix search plus a trigram index.
+
+    Prefix matches come from bisecting the sorted names, so each lookup costs
+    O(log n + limit). When there are fewer than `limit`, the rest are
+    filled with the names sharing the most character trigrams with the query
+    (Jaccard similarity over trigram sets), which tolerates typos and finds
+    matches in the middle of a name. Postings are kept CSR-style, as one
+    sorted array of trigram codes with offsets into a row array.
+    """
+
+    def __init__(self, names, chunk_size=65536):
+        names = [str(name) for name in names]
+        self.names = names
+        order = sorted(range(len(names)), key=names.__getitem__)
+        self.sorted_names = [names[i] for i in order]
+
+        keys = []
+        for start in range(0, len(names), chunk_size):
+            rows, codes = _trigram_codes(names[start:start + chunk_size])
+            # Pack (code, row) so a single sort groups and de-duplicates postings
+            keys.append(_sorted_unique((codes.astype(np.uint64) << np.uint64(32))
+                                       | (rows + start).astype(np.uint64)))
+        keys = np.sort(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.uint64)
+        all_codes = (keys >> np.uint64(32)).astype(np.uint32)
+        self.postings = (keys & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        starts = np.flatnonzero(np.concatenate(([True], all_codes[1:] != all_codes[:-1])))
+        self.codes = all_codes[starts]
+        self.offsets = np.append(starts, len(all_codes)).astype(np.int64)
+        self.trigram_counts = np.bincount(self.postings, minlength=len(names)).astype(np.int32)
+
+    def prefix(self, query, limit=10):
+        """Up to `limit` names starting with `query`, in alphabetical order"""
+        start = bisect_left(self.sorted_names, query)
+        matches = []
+        for name in self.sorted_names[start:start + limit]:
+            if not name.startswith(query):
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy(self, query, limit=10, budget=FUZZY_POSTINGS_BUDGET):
+        """Up to `limit` (row positions, scores) of names ranked by trigram overlap"""
+        _, query_codes = _trigram_codes([query])
+        query_codes = _sorted_unique(query_codes)
+        slots = np.searchsorted(self.codes, query_codes)
+        found = slots < len(self.codes)
+        found[found] = self.codes[slots[found]] == query_codes[found]
+        slots = slots[found]
+        if not slots.shape[0]:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        sizes = self.offsets[slots + 1] - self.offsets[slots]
+        slots, sizes = slots[np.argsort(sizes, kind='stable')], np.sort(sizes)
+        # The rarest trigram is always used; more are added while within budget
+        used = max(1, int(np.searchsorted(np.cumsum(sizes), budget, side='right')))
+        candidates = np.concatenate([self.postings[self.offsets[s]:self.offsets[s + 1]]
+                                     for s in slots[:used]])
+        rows, shared = np.unique(candidates, return_counts=True)
+        scores = shared / (len(query_codes) + self.trigram_counts[rows] - shared)
+        order, scores = top_k(scores, limit)
+        return rows[order], scores
+
+    def suggest(self, query, limit=10):
+        """Prefix matches first, then the closest fuzzy matches, without duplicates"""
+        query = (query or '').lower().strip()
+        if not query:
+            return []
+        matches = self.prefix(query, limit)
+        if len(matches) < limit:
+            seen = set(matches)
+            rows, _ = self.fuzzy(query, limit)
+            for row in rows:
+                name = self.names[row]
+                if name not in seen:
+                    seen.add(name)
+                    matches.append(name)
+                    if len(matches) == limit:
+                        break
+        return matches
@@ -1,77 +1,690 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
+from scipy.sparse import vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from similarity import SimilarityEngine, top_k, top_k_rows
+from ann import IVFIndex
+from blocking import BLOCKING_COLUMNS, block_layout, class_codes
+import artifact
+from ingest import concat_frames, iter_documents, load_catalogue, prepare_frame
+from model import Model
+from cache import LRUCache
+from instrumentation import span, timed
 
-# Load and preprocess data
-df = pd.read_csv("data/drugs.csv")
-df['name'] = df['name'].str.lower().str.strip()
-df['uses_features'] = df['uses_features'].fillna('').astype(str)
-df['side_effect_features'] = df['side_effect_features'].fillna('').astype(str)
+logger = logging.getLogger(__name__)
 
-# Create TF-IDF matrix
-tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
-tfidf_matrix = tfidf.fit_transform(df['uses_features'] + ' ' + df['side_effect_features'])
-cosine_sim = cosine_similarity(tfidf_matrix)
+DATA_PATH = "data/drugs.csv"
+ARTIFACT_DIR = "artifacts"
+NEIGHBOUR_K = 50
+# "exact" ranks against every row (plus a precomputed neighbour table);
+# "ann" uses an approximate IVF index and skips the O(N^2) table build
+SIMILARITY_BACKEND = os.environ.get("RECOMMENDER_BACKEND", "exact")
+# ANN recall/latency knobs: embedding size, inverted lists (None = sqrt(N)),
+# lists probed per query and candidates re-scored exactly. The first two are fixed
+# when the index is built; ANN_PROBE and ANN_RERANK apply on every load
+ANN_COMPONENTS = 128
+ANN_LISTS = None
+ANN_PROBE = 8
+ANN_RERANK = 200
+# Candidates ranked per query before filters are applied
+CANDIDATE_K = 50
+# Most candidates a filtered query may examine before giving up
+SEARCH_BUDGET = 5000
+N_RECOMMENDATIONS = 3
+MAX_RECOMMENDATIONS = CANDIDATE_K
+# "text" ranks by TF-IDF similarity alone; "hybrid" also boosts known substitutes
+RANKERS = ("text", "hybrid")
+RANKER = os.environ.get("RECOMMENDER_RANKER", "text")
+# Added to the cosine similarity of direct and 2-hop substitutes in the hybrid ranker
+DIRECT_SUBSTITUTE_BOOST = 0.3
+TWO_HOP_SUBSTITUTE_BOOST = 0.1
+# Optional class blocking: score only drugs of the query's Therapeutic or Action Class
+BLOCKING_MODES = (None,) + tuple(BLOCKING_COLUMNS)
+N_SUGGESTIONS = 8
+MAX_SUGGESTIONS = 50
+# Cache bounds; CACHE_TTL is in seconds, None keeps entries until evicted
+RESULT_CACHE_ENTRIES = 4096
+RESULT_CACHE_BYTES = 16 * 2**20
+CANDIDATE_CACHE_ENTRIES = 1024
+CANDIDATE_CACHE_BYTES = 64 * 2**20
+CACHE_TTL = None
+# Upper bound on the dense similarity block scored per batch chunk
+BATCH_BLOCK_BYTES = 64 * 2**20
+# How often maybe_reload() checks DATA_PATH for changes; 0 disables hot reload
+RELOAD_SECONDS = float(os.environ.get("RECOMMENDER_RELOAD_SECONDS", 0))
+# Admin updates are appended here and replayed by every worker process on load
+UPDATES_PATH = os.environ.get("RECOMMENDER_UPDATES_PATH", "data/updates.jsonl")
+# How often maybe_reload() checks UPDATES_PATH for other workers' updates; 0 disables it
+UPDATE_SYNC_SECONDS = float(os.environ.get("RECOMMENDER_UPDATE_SYNC_SECONDS", 1))
 
+def fit_model(data, backend=SIMILARITY_BACKEND):
+    """Fit the TF-IDF vectorizer, then precompute the neighbour table (exact
+    backend) or the approximate index (ann backend)"""
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    tfidf_matrix = tfidf.fit_transform(iter_documents(data))
+    engine = SimilarityEngine(tfidf_matrix)
+    _index_engine(engine, backend)
+    return tfidf, engine
+
+def _index_engine(engine, backend=SIMILARITY_BACKEND):
+    if backend == "ann":
+        engine.ann_index = IVFIndex.build(engine.matrix, n_components=ANN_COMPONENTS,
+                                          n_lists=ANN_LISTS, n_probe=ANN_PROBE,
+                                          rerank=ANN_RERANK)
+    else:
+        engine.build_neighbours(NEIGHBOUR_K)
+
+def build_model(data=None, force=False):
+    """Build the on-disk artifact for DATA_PATH unless a current one exists.
+    Returns the artifact path."""
+    content_hash = artifact.file_sha256(DATA_PATH)
+    path = artifact.artifact_path(ARTIFACT_DIR, content_hash, SIMILARITY_BACKEND)
+    if force or not artifact.is_current(path, content_hash, SIMILARITY_BACKEND):
+        data = load_catalogue(DATA_PATH) if data is None else data
+        tfidf, engine = fit_model(data)
+        # Saved in block order so every worker maps the same class blocks instead of copying
+        engine.class_layouts = {mode: block_layout(engine.matrix, class_codes(data[column]))
+                                for mode, column in BLOCKING_COLUMNS.items()}
+        path = artifact.save_artifact(ARTIFACT_DIR, content_hash, tfidf, engine,
+                                      SIMILARITY_BACKEND)
+    return path
+
+def load_model(data):
+    """Load the memory-mapped model, rebuilding it first if the data changed"""
+    try:
+        # Query-time ANN settings come from here, not from the build that wrote the artifact
+        return artifact.load_artifact(build_model(data),
+                                      ann_search={'n_probe': ANN_PROBE, 'rerank': ANN_RERANK})
+    except OSError as e:
+        # Read-only deployments can still serve from an in-memory fit
+        logger.warning("Serving an in-memory model, artifact unavailable: %s", e)
+        return fit_model(data)
+
+# Final recommendations per (drug, filters), and ranked candidate windows per drug
+# shared by every filter combination. Keys include the model version, so entries
+# written by requests still running against a replaced model are never served.
+recommendation_cache = LRUCache(RESULT_CACHE_ENTRIES, RESULT_CACHE_BYTES, CACHE_TTL)
+candidate_cache = LRUCache(CANDIDATE_CACHE_ENTRIES, CANDIDATE_CACHE_BYTES, CACHE_TTL)
+
+# Serialises model replacement; readers never take it
+_swap_lock = threading.Lock()
+# Guards _last_reload_check, so one request per interval stats DATA_PATH
+_reload_check_lock = threading.Lock()
+_model = None
+_data_stat = None
+_last_reload_check = 0.0
+_last_sync_check = 0.0
+# Bytes of UPDATES_PATH already applied to _model
+_updates_offset = 0
+
+def current_model():
+    """The live Model. Callers should fetch it once per request and use that snapshot."""
+    return _model
+
+def _publish(new_model):
+    """Atomically make `new_model` the live model and drop the old caches"""
+    global _model
+    # A single reference assignment: requests see either the old or the new model
+    _model = new_model
+    recommendation_cache.clear()
+    candidate_cache.clear()
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _updates_size():
+    try:
+        return os.stat(UPDATES_PATH).st_size
+    except FileNotFoundError:
+        return 0
+
+def _reload_locked():
+    """reload_model() body; the caller holds _swap_lock"""
+    global _data_stat, _updates_offset
+    stat = _stat(DATA_PATH)
+    data = load_catalogue(DATA_PATH)
+    tfidf, engine = load_model(data)
+    version = 0 if _model is None else _model.version + 1
+    model = Model(data, tfidf, engine, version)
+    graph = model.substitute_graph
+    logger.info("Substitute graph: %d links, %d unresolved substitute names (%d mentions)",
+                graph.n_edges, len(graph.unresolved), sum(graph.unresolved.values()))
+    _publish(model)
+    _data_stat = stat
+    _updates_offset = 0
+    _sync_updates_locked()
+
+def reload_model():
+    """Re-read DATA_PATH, load (or rebuild) its artifact, replay UPDATES_PATH and swap it in"""
+    with _swap_lock:
+        _reload_locked()
+    return _model
+
+def _background_reload():
+    # Skip if another reload or update holds the lock; the next check retries
+    if not _swap_lock.acquire(blocking=False):
+        return
+    try:
+        log_size = _updates_size()
+        if (RELOAD_SECONDS and _stat(DATA_PATH) != _data_stat) or log_size < _updates_offset:
+            # New data, or the update log was cleared (e.g. folded into the data file)
+            _reload_locked()
+        elif log_size > _updates_offset:
+            _sync_updates_locked()
+    except Exception:
+        logger.exception("Background reload of %s failed", DATA_PATH)
+    finally:
+        _swap_lock.release()
+
+def maybe_reload():
+    """Reload in the background if DATA_PATH changed (checked at most every RELOAD_SECONDS)
+    or apply new UPDATES_PATH entries (checked at most every UPDATE_SYNC_SECONDS)"""
+    global _last_reload_check, _last_sync_check
+    if not (RELOAD_SECONDS or UPDATE_SYNC_SECONDS):
+        return False
+    # Requests never wait here: whoever holds the lock does this interval's check
+    if not _reload_check_lock.acquire(blocking=False):
+        return False
+    try:
+        now = time.monotonic()
+        reload_due = RELOAD_SECONDS and now - _last_reload_check >= RELOAD_SECONDS
+        sync_due = UPDATE_SYNC_SECONDS and now - _last_sync_check >= UPDATE_SYNC_SECONDS
+        if reload_due:
+            _last_reload_check = now
+        if sync_due:
+            _last_sync_check = now
+        try:
+            changed = bool((reload_due and _stat(DATA_PATH) != _data_stat) or
+                           (sync_due and _updates_size() != _updates_offset))
+        except OSError:
+            return False
+        if changed and not _swap_lock.locked():
+            threading.Thread(target=_background_reload, daemon=True).start()
+        return changed
+    finally:
+        _reload_check_lock.release()
+
+
+def apply_updates(upserts=None, deletes=()):
+    """Add, change or delete drugs in the live model without refitting.
+
+    `upserts` is a DataFrame or list of dicts with catalogue columns (at least
+    `name`); rows whose name exists replace that drug, others are appended.
+    `deletes` is an iterable of drug names. New text is projected into the
+    existing TF-IDF vocabulary, only the affected neighbour lists (or, for
+    the ANN backend, inverted-list entries) are recomputed, and the new
+    model is swapped in atomically. Changes live in
+    this process only, until a reload_model(); record_updates() also
+    shares them with other workers. Returns the new model version.
+    """
+    with _swap_lock:
+        return _apply_locked(upserts, deletes)
+
+def _apply_locked(upserts, deletes):
+    """apply_updates() body; the caller holds _swap_lock"""
+    old = _model
+    upserts = pd.DataFrame(upserts if upserts is not None else [])
+    if len(upserts):
+        upserts = prepare_frame(upserts.copy()).drop_duplicates('name', keep='last')
+    else:
+        upserts = old.df.iloc[:0]
+    keep = np.ones(old.n_items, dtype=bool)
+    for name in deletes:
+        idx = old.find(name)
+        if idx is not None:
+            keep[idx] = False
+
+    positions = np.array([old.name_index.get(name, -1) for name in upserts['name']],
+                         dtype=np.int64)
+    changed = (positions >= 0) & keep[np.maximum(positions, 0)]
+    upserts = pd.concat([upserts[changed], upserts[~changed]])
+    n_changed = int(changed.sum())
+
+    # Row i of the new catalogue comes from row source[i] of old rows + upserts
+    source = np.arange(old.n_items)
+    source[positions[changed]] = old.n_items + np.arange(n_changed)
+    source = np.concatenate((source[keep],
+                             old.n_items + np.arange(n_changed, len(upserts))))
+    data = concat_frames([old.df, upserts]).iloc[source].reset_index(drop=True)
+    if len(upserts):
+        matrix = vstack([old.engine.matrix, old.tfidf.transform(iter_documents(upserts))],
+                        format='csr')[source]
+    else:
+        # Delete-only: there is no new text to project
+        matrix = old.engine.matrix[source]
+
+    old_positions = np.where(source < old.n_items, source, -1)
+    engine = old.engine.updated(matrix, old_positions)
+    if old.engine.ann_index is not None:
+        # New rows join their nearest inverted list; reload_model() refits the whole index
+        engine.ann_index = old.engine.ann_index.updated(matrix, old_positions)
+    _publish(Model(data, old.tfidf, engine, old.version + 1))
+    return _model.version
+
+def _read_updates(offset):
+    """(upserts, deletes, end offset) of the UPDATES_PATH entries after byte `offset`.
+
+    The entries are folded into one apply_updates() call with the same result
+    as applying them in order: the last entry for a name wins, and a name
+    deleted and then upserted again is appended anew.
+    """
+    try:
+        with open(UPDATES_PATH, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read()
+    except FileNotFoundError:
+        return [], [], offset
+    # A line still being written by another worker is read on the next sync
+    chunk = chunk[:chunk.rfind(b'\n') + 1]
+    upserts, deletes = {}, set()
+    for line in chunk.splitlines():
+        entry = json.loads(line)
+        for name in entry['delete']:
+            name = name.lower().strip()
+            upserts.pop(name, None)
+            deletes.add(name)
+        for row in entry['upsert']:
+            upserts[row['name'].lower().strip()] = row
+    return list(upserts.values()), sorted(deletes), offset + len(chunk)
+
+def _sync_updates_locked():
+    """Apply the UPDATES_PATH entries this process has not applied; the caller holds _swap_lock"""
+    global _updates_offset
+    upserts, deletes, offset = _read_updates(_updates_offset)
+    if upserts or deletes:
+        _apply_locked(upserts, deletes)
+    _updates_offset = offset
+
+def record_updates(upserts=None, deletes=()):
+    """apply_updates() for every worker process: the change is appended to UPDATES_PATH,
+    which this process applies now and the others on their next maybe_reload().
+    `upserts` is a list of JSON-serialisable dicts. Returns the new model version."""
+    entry = json.dumps({'upsert': list(upserts or []), 'delete': list(deletes)}) + '\n'
+    with _swap_lock:
+        os.makedirs(os.path.dirname(UPDATES_PATH) or '.', exist_ok=True)
+        # One unbuffered append per entry, so concurrent writers never interleave lines
+        with open(UPDATES_PATH, 'ab', buffering=0) as f:
+            f.write(entry.encode('utf-8'))
+        # Earlier entries from other workers are applied first, keeping every worker in step
+        _sync_updates_locked()
+        return _model.version
+
+def cache_stats():
+    """Counters for each cache, keyed by cache name"""
+    return {'recommendations': recommendation_cache.stats(),
+            'candidates': candidate_cache.stats()}
+
+def find_drug(drug_name):
+    """Row position of a drug by exact (case-insensitive) name, or None"""
+    return _model.find(drug_name)
+
+@timed("suggest")
+def suggest_drugs(query, limit=N_SUGGESTIONS):
+    """Drug names for a partial or misspelt query: prefix matches, then closest by trigrams"""
+    return _model.name_search.suggest(query, limit)
+
+def get_drug_record(idx):
+    """Detail columns of the drug at row position `idx` as a plain dict"""
+    return _model.record(idx)
+
+@timed("details")
 def get_drug_details(drug_name):
     """Get detailed information for a specific drug (exact match only)"""
     try:
-        drug_name = drug_name.lower().strip()
-        exact_match = df[df['name'] == drug_name]
-        if not exact_match.empty:
-            return exact_match.iloc[0]
+        model = _model
+        with span("details.lookup"):
+            idx = model.find(drug_name)
+        if idx is None:
+            return None
+        with span("details.record"):
+            return model.record(idx)
+    except Exception:
+        logger.exception("Detail lookup failed for %r", drug_name)
         return None
-    except Exception as e:
-        print(f"Error: {str(e)}")
+
+def rank_candidates(model, idx, k=CANDIDATE_K):
+    """Top-k most similar drugs to row `idx` as (indices, scores) arrays"""
+    return model.engine.ranked(idx, k)
+
+def ranked_window(model, idx, k, row=None):
+    """Top-k (indices, scores) for row `idx`, reusing a cached window when deep enough.
+    `row` is the already-scored similarity row, if the caller has one."""
+    approximate = model.engine.ann_index is not None
+    # Approximate windows of different depths are separate searches, not prefixes of one
+    # ranking, so they are cached per depth
+    key = (model.version, idx, k) if approximate else (model.version, idx)
+    cached = candidate_cache.get(key)
+    if cached is not None and (approximate or cached[0].shape[0] >= k):
+        return cached[0][:k], cached[1][:k]
+    indices, scores = rank_candidates(model, idx, k) if row is None else top_k(row, k)
+    candidate_cache.put(key, (indices, scores))
+    return indices, scores
+
+def filtered_candidates(model, idx, n_results, price_range=None, excluded_side_effects=None,
+                        budget=SEARCH_BUDGET):
+    """Up to `n_results` drugs most similar to row `idx` that pass the filters.
+
+    With a price filter, only rows from the sorted price index are scored.
+    Otherwise the ranked similarity order is walked in growing windows,
+    starting from the precomputed neighbours, until enough rows pass or
+    `budget` candidates have been examined. With an approximate index each
+    window is a wider approximate search instead of a full-row scan.
+    """
+    engine = model.engine
+    if price_range:
+        with span("recommend.filter"):
+            rows = model.rows_in_price_range(*price_range)
+        if rows.shape[0] <= budget:
+            with span("recommend.filter"):
+                rows = rows[(rows != idx) & model.filter_mask(rows, None, excluded_side_effects)]
+            with span("recommend.rank"):
+                order, scores = top_k(engine.scores_for(idx, rows), n_results)
+            return rows[order], scores
+
+    limit = min(budget, engine.n_items - 1)
+    k = min(CANDIDATE_K, limit)
+    with span("recommend.rank"):
+        indices, scores = ranked_window(model, idx, k)
+    row = None
+    while True:
+        with span("recommend.filter"):
+            passed = np.flatnonzero(model.filter_mask(indices, price_range, excluded_side_effects))
+        if passed.shape[0] >= n_results or k >= limit:
+            passed = passed[:n_results]
+            return indices[passed], scores[passed]
+        with span("recommend.rank"):
+            k = min(k * 4, limit)
+            if engine.ann_index is not None:
+                # Probe more lists and re-score more rows; a full row would cost O(N)
+                indices, scores = ranked_window(model, idx, k)
+                continue
+            if row is None:
+                # Score the full row once; later windows only re-select from it
+                row = engine.scores(idx)
+                row[idx] = -np.inf
+            indices, scores = ranked_window(model, idx, k, row)
+
+def blocked_candidates(model, idx, n_results, price_range=None, excluded_side_effects=None,
+                       blocking='therapeutic'):
+    """Up to `n_results` drugs most similar to row `idx`, scoring only its class block(s).
+    Returns None when the drug has no class to block on."""
+    engine = model.engine
+    with span("recommend.block"):
+        blocked = model.class_blocks(blocking).scores(idx, engine.dense_row(idx))
+    if blocked is None:
         return None
+    rows, scores = blocked
+    with span("recommend.filter"):
+        keep = (rows != idx) & model.filter_mask(rows, price_range, excluded_side_effects)
+    rows, scores = rows[keep], scores[keep]
+    with span("recommend.rank"):
+        order, scores = top_k(scores, n_results)
+    return rows[order], scores
+
+def text_candidates(model, idx, n_results, price_range=None, excluded_side_effects=None,
+                    blocking=None):
+    """Filtered text-similarity candidates, from the class blocks when `blocking` is set.
+    Blocked searches that find fewer than `n_results` drugs fall back to the full search."""
+    if blocking:
+        found = blocked_candidates(model, idx, n_results, price_range, excluded_side_effects,
+                                   blocking)
+        if found is not None and found[0].shape[0] >= n_results:
+            return found
+    return filtered_candidates(model, idx, n_results, price_range, excluded_side_effects)
+
+def hybrid_candidates(model, idx, n_results, price_range=None, excluded_side_effects=None,
+                      blocking=None):
+    """Up to `n_results` drugs ranked by cosine similarity plus a substitute boost.
+
+    Direct and 2-hop substitutes come from the substitute graph and are scored
+    against only their own rows. When the n_results-th of them already ranks
+    at or above the best unboosted text match (the top of the neighbour
+    table), no similarity scan runs; otherwise they are merged with the
+    filtered text candidates. Returns (indices, cosine similarities) in
+    hybrid-rank order.
+    """
+    engine = model.engine
+    with span("recommend.graph"):
+        direct, two_hop = model.substitute_graph.candidates(idx)
+        rows = np.concatenate([direct, two_hop]).astype(np.intp)
+        boost = np.repeat([DIRECT_SUBSTITUTE_BOOST, TWO_HOP_SUBSTITUTE_BOOST],
+                          [direct.shape[0], two_hop.shape[0]])
+        keep = model.filter_mask(rows, price_range, excluded_side_effects)
+        rows, boost = rows[keep], boost[keep]
+        similarity = engine.scores_for(idx, rows) if rows.shape[0] else np.zeros(0)
+        ranking = similarity + boost
 
-def get_alternative_drugs(drug_name, price_range=None, excluded_side_effects=None):
+    ceiling = (float(engine.neighbour_scores[idx, 0])
+               if engine.neighbour_scores is not None else 1.0)
+    if rows.shape[0] < n_results or np.sort(ranking)[-n_results] < ceiling:
+        with span("recommend.graph_merge"):
+            text_rows, text_scores = text_candidates(model, idx, n_results, price_range,
+                                                     excluded_side_effects, blocking)
+            new = ~np.isin(text_rows, rows)
+            rows = np.concatenate([rows, text_rows[new]])
+            similarity = np.concatenate([similarity, text_scores[new]])
+            ranking = np.concatenate([ranking, text_scores[new]])
+    order, _ = top_k(ranking, n_results)
+    return rows[order], similarity[order]
+
+def recommendation_key(model, idx, k, ranker, blocking, price_range, excluded_side_effects):
+    """Recommendation cache key; the filters are normalised so equivalent requests share it"""
+    return (model.version, model.name_array[idx], k, ranker, blocking,
+            tuple(float(p) for p in price_range) if price_range else None,
+            frozenset(e.strip().lower() for e in excluded_side_effects or ()))
+
+@timed("recommend")
+def get_alternative_drugs(drug_name, price_range=None, excluded_side_effects=None,
+                          k=N_RECOMMENDATIONS, ranker=None, blocking=None):
     """Get recommendations with dynamic filtering. If filters yield no results,
-    fallback to the top 3 alternatives based solely on cosine similarity."""
+    fallback to the top k alternatives based solely on cosine similarity.
+    `ranker` is "text" or "hybrid" (defaults to RANKER); scores are always the
+    cosine similarity, even where substitutes were boosted in the ranking.
+    `blocking` ("therapeutic" or "action") limits the text search to drugs of
+    the same (or, for small classes, the nearest) class."""
+    ranker = ranker or RANKER
+    if ranker not in RANKERS:
+        raise ValueError(f"ranker must be one of {RANKERS}")
+    if blocking not in BLOCKING_MODES:
+        raise ValueError(f"blocking must be one of {BLOCKING_MODES}")
     try:
-        drug_name = drug_name.lower().strip()
-        idx = df[df['name'] == drug_name].index[0]
-        sim_scores = list(enumerate(cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        
-        # Get top 50 candidates (excluding self)
-        top_indices = [i[0] for i in sim_scores[1:51]]
-        recommendations = df.iloc[top_indices].copy()
-        recommendations['similarity'] = [i[1] for i in sim_scores[1:51]]
-        
-        # Apply price filter if enabled
-        if price_range:
-            min_price, max_price = price_range
-            recommendations = recommendations[
-                (recommendations['Price'] >= min_price) & 
-                (recommendations['Price'] <= max_price) &
-                (recommendations['Price'] != -1)
-            ]
-        
-        # Apply side effects filter if any are excluded
-        if excluded_side_effects:
-            mask = ~recommendations['side_effect_features'].str.contains(
-                '|'.join(excluded_side_effects), case=False, na=False
-            )
-            recommendations = recommendations[mask]
-        
-        filtered_recs = recommendations[['name', 'similarity']].head(3).values.tolist()
-        if not filtered_recs:
-            # Fallback: return the top 3 alternatives ignoring filters
-            fallback = []
-            for i, sim in sim_scores[1:]:
-                candidate = df.iloc[i]
-                if candidate['name'] != drug_name:
-                    fallback.append([candidate['name'], sim])
-                if len(fallback) == 3:
-                    break
-            return fallback
-        return filtered_recs
-    except Exception as e:
-        print(f"Error: {str(e)}")
+        model = _model
+        with span("recommend.lookup"):
+            idx = model.find(drug_name)
+        if idx is None:
+            return []
+        with span("recommend.cache"):
+            key = recommendation_key(model, idx, k, ranker, blocking, price_range,
+                                     excluded_side_effects)
+            cached = recommendation_cache.get(key)
+        if cached is not None:
+            return [list(rec) for rec in cached]
+
+        with span("recommend.candidates"):
+            candidates = hybrid_candidates if ranker == "hybrid" else text_candidates
+            indices, scores = candidates(model, idx, k, price_range, excluded_side_effects,
+                                         blocking)
+        if indices.shape[0] == 0:
+            # Fallback: return the top k alternatives ignoring filters
+            with span("recommend.fallback"):
+                indices, scores = rank_candidates(model, idx, k)
+        results = [(model.name_array[i], float(score)) for i, score in zip(indices, scores)]
+        recommendation_cache.put(key, tuple(results))
+        return [list(rec) for rec in results]
+    except Exception:
+        logger.exception("Recommendation failed for %r", drug_name)
         return []
 
+def _ranked_rows(engine, rows, k):
+    """engine.ranked() for several query rows, as (indices, scores) padded with -inf scores"""
+    table = engine.neighbour_indices
+    if table is not None and k <= table.shape[1]:
+        return table[rows, :k], engine.neighbour_scores[rows, :k]
+    if engine.ann_index is not None:
+        return engine.ann_index.search_rows(engine.matrix, rows, k)
+    block = engine.scores_block(rows)
+    block[np.arange(rows.shape[0]), rows] = -np.inf
+    return top_k_rows(block, min(k, engine.n_items - 1))
+
+def _first_passing(indices, scores, passed, k):
+    """Per row, the first k (indices, scores) whose `passed` flag is set; -inf pads the rest"""
+    first = np.argsort(~passed, axis=1, kind='stable')[:, :k]
+    indices = np.take_along_axis(indices, first, axis=1)
+    scores = np.take_along_axis(scores, first, axis=1)
+    scores[~np.take_along_axis(passed, first, axis=1)] = -np.inf
+    return indices, scores
+
+def _filtered_top_k_rows(engine, rows, k, valid_cols):
+    """Top-k (indices, scores) for several query rows over the `valid_cols` rows only"""
+    n_items = engine.n_items
+    if valid_cols.shape[0] > n_items // 2:
+        # Dense-enough filter: score everything and mask, rather than gather rows
+        block = engine.scores_block(rows)
+        block[np.arange(rows.shape[0]), rows] = -np.inf
+        valid = np.zeros(n_items, dtype=bool)
+        valid[valid_cols] = True
+        block[:, ~valid] = -np.inf
+        return top_k_rows(block, k)
+    block = engine.scores_block(rows, valid_cols)
+    pos = np.minimum(np.searchsorted(valid_cols, rows), max(valid_cols.shape[0] - 1, 0))
+    is_self = valid_cols[pos] == rows if valid_cols.shape[0] else np.zeros(rows.shape[0], bool)
+    block[np.flatnonzero(is_self), pos[is_self]] = -np.inf
+    local, scores = top_k_rows(block, k)
+    return valid_cols[local], scores
+
+def _budgeted_top_k_rows(engine, rows, k, valid, limit):
+    """Top-k rows with `valid` set among each query's `limit` most similar rows.
+
+    Equal to taking the first k valid rows of top_k(row, limit), without
+    sorting the window: a row is in it when it scores above the limit-th
+    best score, or ties with it and is among the first such columns.
+    """
+    block = engine.scores_block(rows)
+    block[np.arange(rows.shape[0]), rows] = -np.inf
+    kth = -np.partition(-block, limit - 1, axis=1)[:, limit - 1:limit]
+    above = block > kth
+    ties = block == kth
+    room = limit - above.sum(axis=1, keepdims=True)
+    in_window = above | (ties & (np.cumsum(ties, axis=1) <= room))
+    block[~(in_window & valid)] = -np.inf
+    return top_k_rows(block, k)
+
+def _batch_candidates(model, rows, k, price_range, excluded_side_effects, budget=SEARCH_BUDGET):
+    """filtered_candidates for several query rows, as (indices, scores) padded with -inf.
+
+    Follows the same search: the exact price-index scan for narrow price
+    ranges, otherwise the first ranked window (neighbour table or ANN
+    index), then the first passing rows among the `budget` most similar,
+    or for the ANN index, in growing approximate windows.
+    """
+    engine = model.engine
+    indices = np.zeros((rows.shape[0], k), dtype=np.intp)
+    scores = np.full((rows.shape[0], k), -np.inf)
+
+    def fill(target, found):
+        width = found[0].shape[1]
+        indices[target, :width] = found[0]
+        scores[target, :width] = found[1]
+
+    if price_range:
+        price_rows = model.rows_in_price_range(*price_range)
+        if price_rows.shape[0] <= budget:
+            valid_cols = price_rows[model.filter_mask(price_rows, None, excluded_side_effects)]
+            fill(slice(None), _filtered_top_k_rows(engine, rows, k, valid_cols))
+            return indices, scores
+
+    limit = min(budget, engine.n_items - 1)
+    depth = min(CANDIDATE_K, limit)
+    rest = np.arange(rows.shape[0])
+    while True:
+        window = _ranked_rows(engine, rows[rest], depth)
+        passed = np.isfinite(window[1]) & model.filter_mask(
+            window[0].ravel(), price_range, excluded_side_effects).reshape(window[0].shape)
+        answered = (passed.sum(axis=1) >= k) | (depth >= limit)
+        fill(rest[answered], _first_passing(window[0][answered], window[1][answered],
+                                            passed[answered], k))
+        rest = rest[~answered]
+        if not rest.shape[0] or engine.ann_index is None:
+            break
+        depth = min(depth * 4, limit)
+    if rest.shape[0]:
+        valid = model.filter_mask(np.arange(engine.n_items), price_range, excluded_side_effects)
+        fill(rest, _budgeted_top_k_rows(engine, rows[rest], k, valid, limit))
+    return indices, scores
+
+def get_alternatives_batch(drug_names, k=N_RECOMMENDATIONS, price_range=None,
+                           excluded_side_effects=None, chunk_size=None):
+    """Recommendations for many drugs at once, aligned with `drug_names`.
+
+    Returns what get_alternative_drugs(..., ranker="text") would for each
+    drug, including its SEARCH_BUDGET cut-off, the similarity backend and
+    the unfiltered fallback. Most queries are answered from their first
+    ranked window; the rest are scored in chunks as one sparse matrix
+    product each and reduced with a row-wise top-k, keeping memory bounded
+    by roughly BATCH_BLOCK_BYTES per chunk. Unknown names get an empty list.
+    """
+    model = _model
+    engine = model.engine
+    if chunk_size is None:
+        chunk_size = max(1, BATCH_BLOCK_BYTES // (8 * engine.n_items))
+    positions = [model.find(name) for name in drug_names]
+    known = np.array([i for i, idx in enumerate(positions) if idx is not None], dtype=np.intp)
+    query_rows = np.array([positions[i] for i in known], dtype=np.intp)
+    results = [[] for _ in drug_names]
+
+    for start in range(0, query_rows.shape[0], chunk_size):
+        rows = query_rows[start:start + chunk_size]
+        indices, scores = _batch_candidates(model, rows, k, price_range, excluded_side_effects)
+        empty = (~np.isfinite(scores[:, 0]) if scores.shape[1]
+                 else np.ones(rows.shape[0], dtype=bool))
+        if empty.any():
+            # Fallback: the top-k alternatives ignoring filters
+            fallback_indices, fallback_scores = _ranked_rows(engine, rows[empty], k)
+            width = fallback_indices.shape[1]
+            indices[empty, :width] = fallback_indices
+            scores[empty, :width] = fallback_scores
+        for out, row_indices, row_scores in zip(known[start:start + chunk_size], indices, scores):
+            results[out] = [[model.name_array[i], float(score)]
+                            for i, score in zip(row_indices, row_scores) if score != -np.inf]
+    return results
+
 def get_price_range():
     """Get min and max price from dataset (excludes -1)"""
-    valid_prices = df[df['Price'] != -1]['Price']
-    return (valid_prices.min(), valid_prices.max()) if not valid_prices.empty else (0, 2000)
+    sorted_prices = _model.sorted_prices
+    return (sorted_prices[0], sorted_prices[-1]) if sorted_prices.shape[0] else (0, 2000)
+
+# Load the catalogue and model at import; the command line below loads only what it needs,
+# so `build --force` does not fit the model twice when no artifact exists yet
+if __name__ != "__main__":
+    reload_model()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drug recommender model tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build the precomputed model artifact")
+    build_parser.add_argument("--force", action="store_true",
+                              help="rebuild even if the artifact is up to date")
+    report_parser = subparsers.add_parser(
+        "substitutes", help="summarise the substitute graph and list unresolved names")
+    report_parser.add_argument("--top", type=int, default=20,
+                               help="unresolved names to list, most mentioned first")
+    args = parser.parse_args()
+    if args.command == "build":
+        print(os.path.abspath(build_model(load_catalogue(DATA_PATH), force=args.force)))
+    elif args.command == "substitutes":
+        reload_model()
+        graph = current_model().substitute_graph
+        linked = int((np.diff(graph.indptr) > 0).sum())
+        print(f"{graph.n_edges} substitute links; {linked} of {current_model().n_items} drugs "
+              f"have at least one")
+        print(f"{len(graph.unresolved)} unresolved names "
+              f"({sum(graph.unresolved.values())} mentions):")
+        for name, count in graph.unresolved.most_common(args.top):
+            print(f"  {count:6d}  {name}")
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def parse_side_effects(text):
+    """Split a comma-separated side-effect string into stripped terms"""
+    return [term.strip() for term in str(text).split(',') if term.strip()]
+
+
+class SideEffectIndex:
+    """Per-drug side effects as packed bitsets over an interned vocabulary.
+
+    Terms are matched exactly (case-insensitively), so exclusion is a single
+    vectorized AND over the candidate rows instead of a regex scan.
+    """
+
+    def __init__(self, side_effect_strings):
+        self.vocabulary = {}
+        rows, term_ids = [], []
+        for row, text in enumerate(side_effect_strings):
+            for term in parse_side_effects(text):
+                term_id = self.vocabulary.setdefault(term.lower(), len(self.vocabulary))
+                rows.append(row)
+                term_ids.append(term_id)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        n_words = max(1, -(-len(self.vocabulary) // 64))
+        self.bits = np.zeros((len(side_effect_strings), n_words), dtype=np.uint64)
+        np.bitwise_or.at(self.bits, (np.asarray(rows, dtype=np.int64), term_ids // 64),
+                         np.left_shift(np.uint64(1), (term_ids % 64).astype(np.uint64)))
+
+    def query_mask(self, terms):
+        """Packed bitset for `terms`, or None if none of them occur in the catalogue"""
+        ids = [self.vocabulary[t] for t in (term.strip().lower() for term in terms)
+               if t in self.vocabulary]
+        if not ids:
+            return None
+        mask = np.zeros(self.bits.shape[1], dtype=np.uint64)
+        for term_id in ids:
+            mask[term_id // 64] |= np.uint64(1) << np.uint64(term_id % 64)
+        return mask
+
+    def excludes(self, indices, terms):
+        """Boolean array, True where the drug at each index has any of `terms`"""
+        mask = self.query_mask(terms)
+        if mask is None:
+            return np.zeros(len(indices), dtype=bool)
+        return (self.bits[indices] & mask).any(axis=1)
@@ -0,0 +1,174 @@
+import numpy as np
+
+
+def top_k(row, k):
+    """Indices and scores of the k highest entries of `row`, best first.
+
+    Uses argpartition-style selection instead of a full sort. Ties are broken
+    by lower index, matching a stable descending sort of the whole row.
+    """
+    k = min(k, row.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), row[:0]
+    kth = -np.partition(-row, k - 1)[k - 1]
+    above = np.flatnonzero(row > kth)
+    ties = np.flatnonzero(row == kth)[:k - above.shape[0]]
+    candidates = np.concatenate((above, ties))
+    candidate_scores = row[candidates]
+    order = np.lexsort((candidates, -candidate_scores))
+    return candidates[order], candidate_scores[order]
+
+
+def top_k_rows(block, k):
+    """Row-wise top_k over a 2-D score block, as (indices, scores) of shape (rows, k).
+
+    One argpartition selects every row at once; only rows whose k-th score is
+    tied beyond the cut re-select their ties, so ties break by lower column
+    index exactly as in top_k.
+    """
+    n_rows, n_cols = block.shape
+    k = min(k, n_cols)
+    if k <= 0 or n_rows == 0:
+        return np.empty((n_rows, 0), dtype=np.intp), block[:, :0]
+    candidates = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(block, candidates, axis=1)
+    kth = candidate_scores.min(axis=1)
+    for row in np.flatnonzero((block >= kth[:, None]).sum(axis=1) > k):
+        above = np.flatnonzero(block[row] > kth[row])
+        ties = np.flatnonzero(block[row] == kth[row])[:k - above.shape[0]]
+        candidates[row] = np.concatenate((above, ties))
+        candidate_scores[row] = block[row, candidates[row]]
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
+
+class SimilarityEngine:
+    """Cosine similarity over a sparse, L2-normalised TF-IDF matrix.
+
+    Rows are scored on demand instead of materialising the dense N x N
+    matrix. An optional top-K neighbour table can be precomputed and is
+    stored as compact int32/float32 arrays.
+    """
+
+    def __init__(self, tfidf_matrix, matrix_t=None, neighbour_indices=None,
+                 neighbour_scores=None, ann_index=None, class_layouts=None):
+        # TfidfVectorizer rows are already L2-normalised, so a dot product is the cosine
+        self.matrix = tfidf_matrix.tocsr()
+        # CSR copy of the transpose keeps row x matrix products sparse-by-sparse
+        self.matrix_t = matrix_t if matrix_t is not None else self.matrix.T.tocsr()
+        self.neighbour_indices = neighbour_indices
+        self.neighbour_scores = neighbour_scores
+        # Optional approximate index (ann.IVFIndex) used instead of full-row scoring
+        self.ann_index = ann_index
+        # Optional blocking.block_layout() per blocking mode, for ClassBlocks to reuse
+        self.class_layouts = class_layouts or {}
+
+    @property
+    def n_items(self):
+        return self.matrix.shape[0]
+
+    def scores(self, idx):
+        """Cosine similarity of row `idx` against every row, as a dense 1-D array"""
+        return (self.matrix[idx] @ self.matrix_t).toarray().ravel()
+
+    def dense_row(self, idx):
+        """Row `idx` as a dense vector over the vocabulary"""
+        start, end = self.matrix.indptr[idx], self.matrix.indptr[idx + 1]
+        row = np.zeros(self.matrix.shape[1], dtype=self.matrix.dtype)
+        row[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+        return row
+
+    def scores_for(self, idx, rows):
+        """Cosine similarity of row `idx` against only the given rows"""
+        # Sparse x dense vector skips the sparse x sparse setup, which dominates for few rows
+        return self.matrix[rows] @ self.dense_row(idx)
+
+    def scores_block(self, rows, cols=None):
+        """Dense similarity block of several query rows against every row, or only `cols`"""
+        if cols is None:
+            return (self.matrix[rows] @ self.matrix_t).toarray()
+        # Sparse x dense skips transposing the column subset, which dominates for few rows
+        queries = self.matrix[rows].toarray()
+        return np.ascontiguousarray((self.matrix[cols] @ queries.T).T)
+
+    def build_neighbours(self, k=50, chunk_size=256):
+        """Precompute the top-k neighbours (excluding self) of every row in chunks"""
+        n = self.n_items
+        k = min(k, n - 1)
+        indices = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            block = (self.matrix[start:stop] @ self.matrix_t).toarray()
+            rows = np.arange(stop - start)
+            # Push self-similarity below every real score so it never ranks
+            block[rows, rows + start] = -np.inf
+            indices[start:stop], scores[start:stop] = top_k_rows(block, k)
+        self.neighbour_indices = indices
+        self.neighbour_scores = scores
+        return indices, scores
+
+    def ranked(self, idx, k):
+        """Top-k (indices, scores) for row `idx`, excluding the row itself.
+
+        Served from the neighbour table when it is wide enough, then from the
+        approximate index if one is attached, otherwise scored exactly on demand.
+        """
+        if self.neighbour_indices is not None and k <= self.neighbour_indices.shape[1]:
+            return self.neighbour_indices[idx, :k], self.neighbour_scores[idx, :k]
+        if self.ann_index is not None:
+            return self.ann_index.search(self.matrix, idx, k)
+        row = self.scores(idx)
+        row[idx] = -np.inf
+        return top_k(row, min(k, self.n_items - 1))
+
+    def updated(self, matrix, old_positions, chunk_size=256):
+        """New engine for an edited catalogue, recomputing only affected neighbour lists.
+
+        `old_positions[i]` is the row in this engine that new row `i` was
+        carried over from unchanged, or -1 for new and changed rows. Lists are
+        recomputed for new/changed rows, for rows whose list referenced a
+        deleted or changed row, and for rows a new/changed row now scores at
+        or above the current k-th neighbour of; all other lists are remapped.
+        """
+        engine = SimilarityEngine(matrix)
+        if self.neighbour_indices is None:
+            return engine
+        n_old, k = self.neighbour_indices.shape
+        n_new = engine.n_items
+        k = min(k, n_new - 1)
+        old_positions = np.asarray(old_positions)
+        kept = np.flatnonzero(old_positions >= 0)
+        old_to_new = np.full(n_old, -1, dtype=np.int64)
+        old_to_new[old_positions[kept]] = kept
+
+        indices = np.zeros((n_new, k), dtype=np.int32)
+        scores = np.full((n_new, k), -np.inf, dtype=np.float32)
+        remapped = old_to_new[self.neighbour_indices[old_positions[kept], :k]]
+        indices[kept] = remapped
+        scores[kept] = self.neighbour_scores[old_positions[kept], :k]
+        dirty = old_positions < 0
+        dirty[kept[(remapped < 0).any(axis=1)]] = True
+
+        touched = np.flatnonzero(old_positions < 0)
+        kth = scores[:, -1] if k else np.zeros(n_new, dtype=np.float32)
+        for start in range(0, touched.shape[0], chunk_size):
+            block = engine.scores_block(touched[start:start + chunk_size]).astype(np.float32)
+            dirty |= ((block >= kth) & (block > 0)).any(axis=0)
+
+        rows = np.flatnonzero(dirty)
+        for start in range(0, rows.shape[0], chunk_size):
+            chunk = rows[start:start + chunk_size]
+            block = engine.scores_block(chunk)
+            block[np.arange(chunk.shape[0]), chunk] = -np.inf
+            indices[chunk], scores[chunk] = top_k_rows(block, k)
+        engine.neighbour_indices = indices
+        engine.neighbour_scores = scores
+        return engine
+
+    def neighbours(self, idx):
+        """Precomputed (indices, scores) for row `idx`, or None when no table is built"""
+        if self.neighbour_indices is None:
+            return None
+        return self.neighbour_indices[idx], self.neighbour_scores[idx]
@@ -0,0 +1,69 @@
+from collections import Counter
+
+import numpy as np
+
+
+def parse_substitutes(text):
+    """Split a comma-separated substitutes string into lowercased names"""
+    if not isinstance(text, str):
+        return []
+    return [name.strip().lower() for name in text.split(',') if name.strip()]
+
+
+class SubstituteGraph:
+    """Known substitutes as an undirected CSR adjacency graph over row positions.
+
+    Each drug's substitutes_features names are resolved through the name
+    index once; listing B as a substitute of A links both ways. Names that
+    are not in the catalogue are dropped and tallied in `unresolved`.
+    Neighbour lookups are array slices, and 2-hop expansion gathers every
+    direct neighbour's slice in one vectorized step.
+    """
+
+    def __init__(self, substitute_strings, name_index):
+        sources, targets = [], []
+        self.unresolved = Counter()
+        for row, text in enumerate(substitute_strings):
+            for name in parse_substitutes(text):
+                target = name_index.get(name)
+                if target is None:
+                    self.unresolved[name] += 1
+                elif target != row:
+                    sources.append(row)
+                    targets.append(target)
+        n_items = len(substitute_strings)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        # Both directions, de-duplicated via one sort of packed (source, target) keys
+        keys = np.sort(np.concatenate([sources * n_items + targets, targets * n_items + sources]))
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        self.indices = (keys % max(n_items, 1)).astype(np.int32)
+        self.indptr = np.zeros(n_items + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // max(n_items, 1), minlength=n_items), out=self.indptr[1:])
+
+    @property
+    def n_edges(self):
+        """Undirected edges"""
+        return self.indices.shape[0] // 2
+
+    def neighbours(self, idx):
+        """Direct substitutes of row `idx`"""
+        return self.indices[self.indptr[idx]:self.indptr[idx + 1]]
+
+    def expand(self, rows):
+        """Every neighbour of `rows`, with repeats, as one gather"""
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(lengths.sum())]
+
+    def candidates(self, idx):
+        """(direct, two_hop) substitute rows of `idx`; two_hop excludes direct ones and idx"""
+        direct = self.neighbours(idx)
+        two_hop = np.sort(self.expand(direct))
+        if two_hop.shape[0]:
+            two_hop = two_hop[np.concatenate(([True], two_hop[1:] != two_hop[:-1]))]
+            # Rows are stored sorted, so membership in `direct` is a binary search
+            slot = np.searchsorted(direct, two_hop).clip(max=direct.shape[0] - 1)
+            two_hop = two_hop[(two_hop != idx) & (direct[slot] != two_hop)]
+        return direct, two_hop
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# recommender reads data/ and artifacts/ relative to the working directory
+os.chdir(ROOT)
+
+
+@pytest.fixture
+def live_model():
+    """The live model; anything a test publishes is replaced by it again afterwards"""
+    import recommender
+    model = recommender.current_model()
+    yield model
+    recommender._publish(model)
+
+
+@pytest.fixture(scope="session")
+def tfidf_matrix():
+    """L2-normalised TF-IDF rows of 800 documents drawn from 8 overlapping topics"""
+    rng = np.random.default_rng(0)
+    topics = [[f"t{topic}w{word}" for word in range(25)] + [f"shared{word}" for word in range(10)]
+              for topic in range(8)]
+    docs = [" ".join(rng.choice(topics[i % 8], rng.integers(4, 12))) for i in range(800)]
+    return TfidfVectorizer().fit_transform(docs).tocsr()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from ann import IVFIndex
+from similarity import SimilarityEngine
+
+
+def _recall(index, engine, queries, k, **search):
+    hits = 0
+    for idx in queries:
+        exact, _ = engine.ranked(idx, k)
+        found, _ = index.search(engine.matrix, idx, k, **search)
+        hits += np.isin(found, exact).sum()
+    return hits / (k * len(queries))
+
+
+def test_full_probe_is_exact(tfidf_matrix):
+    engine = SimilarityEngine(tfidf_matrix)
+    index = IVFIndex.build(tfidf_matrix, n_components=16, n_lists=8)
+    for idx in range(0, 800, 40):
+        found, scores = index.search(tfidf_matrix, idx, 10, n_probe=8, rerank=800)
+        expected, expected_scores = engine.ranked(idx, 10)
+        np.testing.assert_allclose(scores, expected_scores)
+        assert idx not in found
+
+
+def test_partial_probe_recall(tfidf_matrix):
+    engine = SimilarityEngine(tfidf_matrix)
+    index = IVFIndex.build(tfidf_matrix, n_components=16, n_lists=8, n_probe=2, rerank=100)
+    assert _recall(index, engine, range(0, 800, 8), 10) >= 0.9
+
+
+def test_lists_partition_rows(tfidf_matrix):
+    index = IVFIndex.build(tfidf_matrix, n_components=16, n_lists=8)
+    assert sorted(index.list_items.tolist()) == list(range(tfidf_matrix.shape[0]))
+    assert index.list_offsets[-1] == tfidf_matrix.shape[0]
+
+
+def test_projection_reproduces_fitted_embeddings(tfidf_matrix):
+    index = IVFIndex.build(tfidf_matrix, n_components=16, n_lists=8)
+    np.testing.assert_allclose(index.project(tfidf_matrix[:100]), index.embeddings[:100],
+                               atol=1e-5)
+
+
+def test_updated_splices_lists(tfidf_matrix):
+    n_old = 600
+    index = IVFIndex.build(tfidf_matrix[:n_old], n_components=16, n_lists=8, n_probe=2,
+                           rerank=100)
+    # Delete every 10th row, change row 5 to another document's text, append 200 rows
+    kept = np.array([row for row in range(n_old) if row % 10])
+    old_positions = np.concatenate([kept, np.full(200, -1)])
+    old_positions[np.flatnonzero(kept == 5)] = -1
+    rows = np.concatenate([kept, np.arange(n_old, 800)])
+    rows[np.flatnonzero(kept == 5)] = 700
+    matrix = tfidf_matrix[rows]
+    updated = index.updated(matrix, old_positions)
+
+    assert sorted(updated.list_items.tolist()) == list(range(matrix.shape[0]))
+    assert updated.list_offsets[-1] == matrix.shape[0]
+    lists = np.repeat(np.arange(8), np.diff(updated.list_offsets))
+    assignment = np.empty(matrix.shape[0], dtype=np.int64)
+    assignment[updated.list_items] = lists
+    # Kept rows stay in their list, new and changed rows join their nearest one
+    old_lists = np.repeat(np.arange(8), np.diff(index.list_offsets))
+    old_assignment = np.empty(n_old, dtype=np.int64)
+    old_assignment[index.list_items] = old_lists
+    carried = np.flatnonzero(old_positions >= 0)
+    assert (assignment[carried] == old_assignment[old_positions[carried]]).all()
+    touched = np.flatnonzero(old_positions < 0)
+    nearest = (updated.embeddings[touched] @ updated.centroids.T).argmax(axis=1)
+    assert (assignment[touched] == nearest).all()
+    np.testing.assert_allclose(updated.embeddings[touched], index.project(matrix[touched]))
+    engine = SimilarityEngine(matrix)
+    assert _recall(updated, engine, range(0, matrix.shape[0], 8), 10) >= 0.9
@@ -0,0 +1,47 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import artifact
+from ann import IVFIndex
+from blocking import block_layout
+from similarity import SimilarityEngine
+
+DOCS = ["pain relief fever", "fever headache", "acid reflux heartburn", "heartburn nausea",
+        "allergy sneezing", "sneezing runny nose", "pain inflammation", "nausea vomiting"] * 8
+
+
+def _saved_ann_artifact(tmp_path):
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+    engine = SimilarityEngine(tfidf.fit_transform(DOCS))
+    engine.ann_index = IVFIndex.build(engine.matrix, n_components=4, n_lists=4,
+                                      n_probe=1, rerank=5)
+    return artifact.save_artifact(str(tmp_path), "0" * 64, tfidf, engine, "ann"), engine
+
+
+def test_class_layouts_round_trip(tmp_path):
+    tfidf = TfidfVectorizer()
+    engine = SimilarityEngine(tfidf.fit_transform(DOCS))
+    codes = np.arange(len(DOCS)) % 3 - 1
+    engine.class_layouts = {'therapeutic': block_layout(engine.matrix, codes)}
+    path = artifact.save_artifact(str(tmp_path), "0" * 64, tfidf, engine)
+    _, loaded = artifact.load_artifact(path)
+    rows, offsets, blocked = loaded.class_layouts['therapeutic']
+    assert isinstance(rows, np.memmap)
+    expected = engine.class_layouts['therapeutic']
+    assert rows.tolist() == expected[0].tolist() and offsets.tolist() == expected[1].tolist()
+    assert (blocked != expected[2]).nnz == 0
+
+
+def test_load_uses_current_ann_search_settings(tmp_path):
+    path, _ = _saved_ann_artifact(tmp_path)
+    _, engine = artifact.load_artifact(path, ann_search={'n_probe': 3, 'rerank': 20})
+    assert (engine.ann_index.n_probe, engine.ann_index.rerank) == (3, 20)
+
+
+def test_load_defaults_to_saved_ann_search_settings(tmp_path):
+    path, built = _saved_ann_artifact(tmp_path)
+    assert artifact.is_current(path, "0" * 64, "ann")
+    tfidf, engine = artifact.load_artifact(path)
+    assert (engine.ann_index.n_probe, engine.ann_index.rerank) == (1, 5)
+    assert (engine.matrix != built.matrix).nnz == 0
+    assert tfidf.transform(["fever"]).shape[1] == built.matrix.shape[1]
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+import pytest
+
+import recommender
+from ann import IVFIndex
+from microbatch import MicroBatcher
+from model import Model
+from similarity import SimilarityEngine
+
+
+@pytest.fixture(scope="module")
+def queries():
+    model = recommender.current_model()
+    rng = np.random.default_rng(0)
+    names = [model.name_array[i] for i in rng.choice(model.n_items, 100, replace=False)]
+    effects = model.df['side_effect_features'].str.split(',').explode().str.strip()
+    common = effects[effects != ''].value_counts().index[:40].tolist()
+    prices = model.sorted_prices
+    price_range = (float(np.percentile(prices, 5)), float(np.percentile(prices, 95)))
+    return names, common, price_range
+
+
+def _single(names, price_range, excluded, k):
+    recommender.recommendation_cache.clear()
+    recommender.candidate_cache.clear()
+    return [recommender.get_alternative_drugs(name, price_range, excluded, k, "text")
+            for name in names]
+
+
+def _names(results):
+    return [[name for name, _ in result] for result in results]
+
+
+@pytest.mark.parametrize("mix, k", [
+    ("none", 3), ("none", 60), ("side_effects", 3), ("wide_side_effects", 3),
+    ("wide_side_effects", 60), ("price", 5), ("price+side_effects", 10),
+])
+def test_batch_matches_single_queries(queries, mix, k):
+    names, common, prices = queries
+    price_range = prices if mix.startswith("price") else None
+    excluded = {"none": None, "side_effects": common[:2], "wide_side_effects": common,
+                "price": None, "price+side_effects": common[:3]}[mix]
+    batched = recommender.get_alternatives_batch(names, k, price_range, excluded, chunk_size=16)
+    single = _single(names, price_range, excluded, k)
+    assert _names(batched) == _names(single)
+    for a, b in zip(batched, single):
+        np.testing.assert_allclose([s for _, s in a], [s for _, s in b], atol=1e-9)
+
+
+@pytest.fixture(scope="module")
+def ann_engine():
+    matrix = recommender.current_model().engine.matrix
+    return SimilarityEngine(matrix, ann_index=IVFIndex.build(matrix, n_components=32, n_lists=50,
+                                                             n_probe=4, rerank=100))
+
+
+@pytest.mark.parametrize("mix, k", [("side_effects", 3), ("wide_side_effects", 60),
+                                    ("price+side_effects", 10)])
+def test_ann_widens_instead_of_scanning(monkeypatch, live_model, ann_engine, queries, mix, k):
+    names, common, prices = queries
+    recommender._publish(Model(live_model.df, live_model.tfidf, ann_engine,
+                               live_model.version + 1))
+    price_range = prices if mix.startswith("price") else None
+    excluded = {"side_effects": common[:2], "wide_side_effects": common,
+                "price+side_effects": common[:3]}[mix]
+    monkeypatch.setattr(ann_engine, "scores", None)
+    monkeypatch.setattr(recommender, "_budgeted_top_k_rows", None)
+    batched = recommender.get_alternatives_batch(names, k, price_range, excluded, chunk_size=16)
+    single = _single(names, price_range, excluded, k)
+    assert _names(batched) == _names(single)
+    model = recommender.current_model()
+    rows = np.array([model.find(name) for result in single for name, _ in result])
+    assert model.filter_mask(rows, price_range, excluded).all()
+    if price_range is None:
+        assert sum(len(result) == k for result in single) > 0.9 * len(names)
+
+
+def test_batch_unknown_names(queries):
+    names, _, _ = queries
+    results = recommender.get_alternatives_batch(["no such drug", names[0]], 3)
+    assert results[0] == []
+    assert len(results[1]) == 3
+
+
+def test_micro_batcher_coalesces_concurrent_requests(queries):
+    names, common, _ = queries
+    recommender.recommendation_cache.clear()
+    batcher = MicroBatcher(window_ms=20, max_size=16)
+    barrier = threading.Barrier(len(names[:32]))
+    results = {}
+
+    def call(name):
+        barrier.wait()
+        results[name] = batcher.submit(name, None, common[:2], 5).result(timeout=30)
+
+    threads = [threading.Thread(target=call, args=(name,)) for name in names[:32]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = batcher.stats()
+    assert stats['requests'] == 32
+    assert stats['batches'] < 32
+    expected = _single(names[:32], None, common[:2], 5)
+    assert [results[name] for name in names[:32]] == expected
+
+
+def test_micro_batcher_serves_cache_and_unknown_names(queries):
+    names, common, _ = queries
+    batcher = MicroBatcher(window_ms=1, max_size=4)
+    assert batcher.submit("no such drug", None, common[:1]).result(timeout=5) == []
+    first = batcher.submit(names[0], None, common[:1]).result(timeout=30)
+    assert recommender.get_alternative_drugs(names[0], None, common[:1]) == first
+    # A repeat is answered from the shared cache without queueing
+    assert batcher.submit(names[0], None, common[:1]).result(timeout=0) == first
+    assert batcher.stats()['requests'] == 1
@@ -0,0 +1,75 @@
+import threading
+
+import numpy as np
+
+import recommender
+from blocking import ClassBlocks, block_layout
+from model import Model
+
+
+def test_blocks_partition_classified_rows(tfidf_matrix):
+    codes = np.arange(tfidf_matrix.shape[0]) % 8
+    codes[::50] = -1
+    blocks = ClassBlocks(tfidf_matrix, codes, min_rows=10)
+    assert blocks.n_blocks == 8
+    assert sorted(blocks.rows.tolist()) == np.flatnonzero(codes >= 0).tolist()
+    for b in range(8):
+        assert (codes[blocks.rows[blocks.offsets[b]:blocks.offsets[b + 1]]] == b).all()
+    assert blocks.search_set(0) is None and blocks.scores(0, None) is None
+
+
+def test_small_classes_are_widened(tfidf_matrix):
+    codes = np.arange(tfidf_matrix.shape[0]) % 8
+    codes[codes == 7] = np.where(np.arange((codes == 7).sum()) < 5, 7, 6)
+    blocks = ClassBlocks(tfidf_matrix, codes, min_rows=60)
+    sizes = np.diff(blocks.offsets)
+    assert sizes[7] == 5
+    search = blocks.search_set(np.flatnonzero(codes == 7)[0])
+    assert search[0] == 7 and sizes[search].sum() >= 60
+    assert blocks.search_set(np.flatnonzero(codes == 0)[0]).tolist() == [0]
+
+
+def test_block_scores_match_full_scores(tfidf_matrix):
+    codes = np.arange(tfidf_matrix.shape[0]) % 8
+    blocks = ClassBlocks(tfidf_matrix, codes, min_rows=10)
+    engine = recommender.SimilarityEngine(tfidf_matrix)
+    rows, scores = blocks.scores(3, engine.dense_row(3))
+    assert set(rows.tolist()) == set(np.flatnonzero(codes == 3).tolist())
+    np.testing.assert_allclose(scores, engine.scores(3)[rows])
+
+
+def test_precomputed_layout_is_shared_not_copied(tfidf_matrix):
+    codes = np.arange(tfidf_matrix.shape[0]) % 8
+    layout = block_layout(tfidf_matrix, codes)
+    blocks = ClassBlocks(tfidf_matrix, codes, min_rows=10, layout=layout)
+    copied = ClassBlocks(tfidf_matrix, codes, min_rows=10)
+    for block, reference in zip(blocks.blocks, copied.blocks):
+        assert np.shares_memory(block.data, layout[2].data)
+        assert (block != reference).nnz == 0
+    assert [s.tolist() for s in blocks.search] == [s.tolist() for s in copied.search]
+
+
+def test_blocks_are_built_once_on_first_use():
+    live = recommender.current_model()
+    model = Model(live.df, live.tfidf, live.engine, live.version)
+    assert model._class_blocks == {}
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(model.class_blocks('action')))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(blocks is found[0] for blocks in found)
+    assert list(model._class_blocks) == ['action']
+
+
+def test_blocked_recommendations_stay_in_searched_classes():
+    model = recommender.current_model()
+    for mode in recommender.BLOCKING_MODES[1:]:
+        blocks = model.class_blocks(mode)
+        for idx in np.flatnonzero(blocks.codes >= 0)[:30]:
+            searched = set(blocks.codes[blocks.scores(idx, model.engine.dense_row(idx))[0]])
+            for name, _ in recommender.get_alternative_drugs(model.name_array[idx], k=3,
+                                                             blocking=mode):
+                assert blocks.codes[model.find(name)] in searched
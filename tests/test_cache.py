@@ -0,0 +1,52 @@
+import numpy as np
+
+import cache
+from cache import LRUCache, estimate_size
+
+
+def test_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.stats()['evictions'] == 1
+
+
+def test_byte_cap():
+    lru = LRUCache(max_entries=100, max_bytes=1000)
+    for key in range(5):
+        lru.put(key, np.zeros(40))  # 320 bytes each
+    stats = lru.stats()
+    assert stats['entries'] == 3 and stats['bytes'] == 960
+    assert lru.get(0) is None and lru.get(4) is not None
+    # Values larger than the whole cache are not stored
+    lru.put("big", np.zeros(200))
+    assert lru.get("big") is None and lru.stats()['entries'] == 3
+
+
+def test_replacing_a_key_updates_bytes():
+    lru = LRUCache(max_bytes=10_000)
+    lru.put("a", np.zeros(10))
+    lru.put("a", np.zeros(20))
+    assert lru.stats() == {**lru.stats(), 'entries': 1, 'bytes': 160}
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(ttl=5)
+    lru.put("a", 1)
+    now[0] += 4.9
+    assert lru.get("a") == 1
+    now[0] += 0.2
+    assert lru.get("a") is None
+    stats = lru.stats()
+    assert stats['expirations'] == 1 and stats['entries'] == 0 and stats['bytes'] == 0
+
+
+def test_estimate_size_counts_nested_arrays():
+    value = (np.zeros(10), [np.zeros(5)])
+    assert estimate_size(value) > 120
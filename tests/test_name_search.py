@@ -0,0 +1,42 @@
+import pytest
+
+import recommender
+from name_search import NameSearch
+
+NAMES = ["paracetamol", "pantoprazole", "pan 40", "amoxicillin", "azithromycin",
+         "augmentin 625", "ibuprofen", "cetirizine", "levocetirizine"]
+
+
+@pytest.fixture(scope="module")
+def search():
+    return NameSearch(NAMES)
+
+
+def test_prefix_is_alphabetical(search):
+    assert search.prefix("pa") == ["pan 40", "pantoprazole", "paracetamol"]
+    assert search.prefix("pa", limit=1) == ["pan 40"]
+    assert search.prefix("zz") == []
+
+
+def test_fuzzy_tolerates_typos(search):
+    rows, scores = search.fuzzy("amoxicilin", limit=3)
+    assert NAMES[rows[0]] == "amoxicillin"
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_fuzzy_matches_inside_names(search):
+    assert search.suggest("cetiriz", limit=2) == ["cetirizine", "levocetirizine"]
+
+
+def test_suggest_prefix_first_without_duplicates(search):
+    suggestions = search.suggest("Pan", limit=5)
+    assert suggestions[:2] == ["pan 40", "pantoprazole"]
+    assert len(suggestions) == len(set(suggestions))
+    assert search.suggest("   ") == []
+
+
+def test_catalogue_misspellings():
+    model = recommender.current_model()
+    for name in [n for n in model.name_array[:200] if len(n) >= 8][:20]:
+        typo = name[:3] + name[4:]
+        assert name in recommender.suggest_drugs(typo, limit=10)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import recommender
+
+
+@pytest.fixture(scope="module")
+def priced_rows():
+    model = recommender.current_model()
+    return model, np.flatnonzero(model.price_array != -1)
+
+
+def _catalogue_price(value):
+    """The price as written in the catalogue, e.g. 22.51 for the stored 22.5100002"""
+    return float(np.format_float_positional(value))
+
+
+def test_price_range_includes_both_bounds(priced_rows):
+    model, rows = priced_rows
+    for idx in rows:
+        price = _catalogue_price(model.price_array[idx])
+        assert idx in model.rows_in_price_range(price, price)
+        assert model.filter_mask(np.array([idx]), (price, price))[0]
+        assert model.filter_mask(np.array([idx]), (0, price))[0]
+        assert model.filter_mask(np.array([idx]), (price, np.inf))[0]
+
+
+def test_price_range_excludes_just_outside(priced_rows):
+    model, rows = priced_rows
+    for idx in rows:
+        price = _catalogue_price(model.price_array[idx])
+        assert not model.filter_mask(np.array([idx]), (price + 0.01, np.inf))[0]
+        assert not model.filter_mask(np.array([idx]), (0, price - 0.01))[0]
+        assert idx not in model.rows_in_price_range(price + 0.01, np.inf)
+
+
+def test_unknown_prices_never_pass():
+    model = recommender.current_model()
+    unknown = np.flatnonzero(model.price_array == -1)
+    assert not model.filter_mask(unknown, (-np.inf, np.inf)).any()
+    assert not np.isin(unknown, model.rows_in_price_range(-np.inf, np.inf)).any()
+
+
+def test_recommendations_respect_bounds(priced_rows):
+    model, rows = priced_rows
+    prices = np.sort(model.price_array[rows])
+    price_range = (_catalogue_price(prices[len(prices) // 4]),
+                   _catalogue_price(prices[3 * len(prices) // 4]))
+    query = model.name_array[rows[0]]
+    for name, _ in recommender.get_alternative_drugs(query, price_range, k=10):
+        price = _catalogue_price(model.record(model.find(name))['Price'])
+        assert price_range[0] <= price <= price_range[1]
+
+
+@pytest.mark.parametrize("price", [22.51, 8.95, 0.1])
+def test_inexact_float32_price_at_bounds(live_model, price):
+    recommender.apply_updates([{'name': "bound test drug", 'Price': price,
+                                'uses_features': "pain relief"}])
+    model = recommender.current_model()
+    idx = model.find("bound test drug")
+    assert idx in model.rows_in_price_range(price, price)
+    assert model.filter_mask(np.array([idx]), (price, price))[0]
+    assert model.filter_mask(np.array([idx]), (0, price))[0]
+    assert model.filter_mask(np.array([idx]), (price, 1000))[0]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from side_effects import SideEffectIndex, parse_side_effects
+
+STRINGS = ["Nausea, Headache", "headache ,Dizziness", "", None, "Rash",
+           ", ".join(f"effect {i}" for i in range(100))]
+
+
+def test_parse_side_effects():
+    assert parse_side_effects(" Nausea ,, Headache ") == ["Nausea", "Headache"]
+    assert parse_side_effects("") == []
+
+
+def test_excludes_matches_naive_filter():
+    index = SideEffectIndex(STRINGS)
+    rows = np.arange(len(STRINGS))
+    for terms in (["nausea"], ["HEADACHE "], ["rash", "dizziness"], ["effect 99", "effect 3"]):
+        wanted = {t.strip().lower() for t in terms}
+        expected = [bool(wanted & {t.lower() for t in parse_side_effects(s or "")})
+                    for s in STRINGS]
+        assert index.excludes(rows, terms).tolist() == expected
+
+
+def test_excludes_is_exact_term_match():
+    index = SideEffectIndex(STRINGS)
+    rows = np.arange(len(STRINGS))
+    # Substrings and unknown terms exclude nothing
+    assert not index.excludes(rows, ["head"]).any()
+    assert not index.excludes(rows, ["unknown"]).any()
+    assert not index.excludes(rows, []).any()
+
+
+def test_vocabulary_spans_several_words():
+    index = SideEffectIndex(STRINGS)
+    assert index.bits.shape[1] == 2
+    assert index.excludes(np.array([5, 0]), ["effect 70"]).tolist() == [True, False]
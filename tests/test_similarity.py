@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from scipy.sparse import vstack
+
+from similarity import SimilarityEngine, top_k, top_k_rows
+
+K = 10
+
+
+def _brute_force(matrix, k):
+    block = (matrix @ matrix.T).toarray()
+    np.fill_diagonal(block, -np.inf)
+    order = np.lexsort((np.broadcast_to(np.arange(block.shape[1]), block.shape), -block), axis=1)
+    return order[:, :k], np.take_along_axis(block, order[:, :k], axis=1)
+
+
+def test_top_k_breaks_ties_by_lower_index():
+    order, scores = top_k(np.array([0.5, 0.9, 0.5, 0.9, 0.1]), 3)
+    assert order.tolist() == [1, 3, 0]
+    assert scores.tolist() == [0.9, 0.9, 0.5]
+
+
+def test_top_k_rows_matches_top_k(tfidf_matrix):
+    block = (tfidf_matrix[:50] @ tfidf_matrix.T).toarray()
+    indices, scores = top_k_rows(block, K)
+    for row in range(block.shape[0]):
+        order, row_scores = top_k(block[row], K)
+        assert indices[row].tolist() == order.tolist()
+        np.testing.assert_array_equal(scores[row], row_scores)
+
+
+def test_build_neighbours_matches_brute_force(tfidf_matrix):
+    engine = SimilarityEngine(tfidf_matrix)
+    indices, scores = engine.build_neighbours(K, chunk_size=97)
+    expected_indices, expected_scores = _brute_force(tfidf_matrix, K)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+    assert (indices == expected_indices).mean() > 0.99  # float32 rounding may swap near-ties
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_updated_matches_full_rebuild(tfidf_matrix, seed):
+    rng = np.random.default_rng(seed)
+    n_old = 600
+    old = SimilarityEngine(tfidf_matrix[:n_old])
+    old.build_neighbours(K)
+
+    # Delete 30 rows, change 20 (to another document's text) and append 40
+    kept = np.sort(rng.choice(n_old, n_old - 30, replace=False))
+    changed = rng.choice(kept.shape[0], 20, replace=False)
+    old_positions = kept.copy()
+    old_positions[changed] = -1
+    rows = kept.copy()
+    rows[changed] = rng.choice(np.arange(n_old, 800), 20, replace=False)
+    matrix = vstack([tfidf_matrix[rows], tfidf_matrix[760:800]], format='csr')
+    old_positions = np.concatenate([old_positions, np.full(40, -1)])
+
+    updated = old.updated(matrix, old_positions)
+    rebuilt = SimilarityEngine(matrix)
+    rebuilt.build_neighbours(K)
+    np.testing.assert_allclose(updated.neighbour_scores, rebuilt.neighbour_scores, rtol=1e-6)
+    # Neighbour sets agree wherever the k-th score is not tied
+    for row in range(matrix.shape[0]):
+        kth = rebuilt.neighbour_scores[row, -1]
+        assert (set(updated.neighbour_indices[row][updated.neighbour_scores[row] > kth])
+                == set(rebuilt.neighbour_indices[row][rebuilt.neighbour_scores[row] > kth]))
+
+
+def test_ranked_and_scores_for_agree_with_scores(tfidf_matrix):
+    engine = SimilarityEngine(tfidf_matrix)
+    engine.build_neighbours(K)
+    row = engine.scores(5)
+    np.testing.assert_allclose(engine.scores_for(5, np.arange(100)), row[:100])
+    indices, scores = engine.ranked(5, K)
+    assert 5 not in indices
+    np.testing.assert_allclose(scores, row[indices], rtol=1e-6)
+    # Deeper than the table: scored exactly
+    indices, scores = engine.ranked(5, 3 * K)
+    assert indices.shape[0] == 3 * K and np.all(np.diff(scores) <= 0)
+
+
+def test_scores_block_with_columns(tfidf_matrix):
+    engine = SimilarityEngine(tfidf_matrix)
+    rows, cols = np.array([3, 7, 11]), np.arange(0, 800, 3)
+    np.testing.assert_allclose(engine.scores_block(rows, cols), engine.scores_block(rows)[:, cols])
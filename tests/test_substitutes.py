@@ -0,0 +1,49 @@
+import numpy as np
+
+import recommender
+from substitutes import SubstituteGraph, parse_substitutes
+
+STRINGS = ["b, c, unknown", "a", "d", "", None, "a, a, e, f"]
+NAME_INDEX = {name: i for i, name in enumerate("abcdef")}
+
+
+def test_parse_substitutes():
+    assert parse_substitutes(" Foo ,, BAR ") == ["foo", "bar"]
+    assert parse_substitutes(None) == []
+
+
+def test_graph_is_undirected_and_deduplicated():
+    graph = SubstituteGraph(STRINGS, NAME_INDEX)
+    assert graph.neighbours(0).tolist() == [1, 2, 5]
+    assert graph.neighbours(1).tolist() == [0]
+    assert graph.neighbours(3).tolist() == [2]
+    assert graph.neighbours(4).tolist() == [5]
+    assert graph.neighbours(5).tolist() == [0, 4]
+    assert graph.n_edges == 5
+    assert graph.unresolved == {"unknown": 1}
+
+
+def test_two_hop_candidates():
+    graph = SubstituteGraph(STRINGS, NAME_INDEX)
+    direct, two_hop = graph.candidates(1)
+    assert direct.tolist() == [0]
+    assert two_hop.tolist() == [2, 5]
+    # Self-links are dropped
+    assert 5 not in graph.neighbours(5)
+    direct, two_hop = graph.candidates(3)
+    assert direct.tolist() == [2] and two_hop.tolist() == [0]
+
+
+def test_hybrid_ranks_by_boosted_similarity():
+    model = recommender.current_model()
+    graph = model.substitute_graph
+    linked = np.flatnonzero(np.diff(graph.indptr) > 0)[:50]
+    for idx in linked:
+        rows, similarity = recommender.hybrid_candidates(model, idx, 5)
+        direct, two_hop = graph.candidates(idx)
+        boost = np.where(np.isin(rows, direct), recommender.DIRECT_SUBSTITUTE_BOOST,
+                         np.where(np.isin(rows, two_hop), recommender.TWO_HOP_SUBSTITUTE_BOOST, 0))
+        ranking = similarity + boost
+        assert np.all(np.diff(ranking) <= 1e-9)
+        assert idx not in rows
+        np.testing.assert_allclose(similarity, model.engine.scores_for(idx, rows))
@@ -0,0 +1,184 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import api
+import app
+import recommender
+from ann import IVFIndex
+from model import Model
+from similarity import SimilarityEngine
+
+
+def _row(model, idx, **changes):
+    record = {col: model.df[col].iloc[idx] for col in model.df.columns}
+    record = {col: (None if isinstance(value, float) and np.isnan(value) else value)
+              for col, value in record.items()}
+    record['Price'] = float(record['Price'])
+    record.update(changes)
+    return record
+
+
+def test_delete_only(live_model):
+    name = live_model.name_array[3]
+    version = recommender.apply_updates(None, [name])
+    model = recommender.current_model()
+    assert version == live_model.version + 1
+    assert model.n_items == live_model.n_items - 1
+    assert model.find(name) is None
+    assert not np.isin(model.engine.neighbour_indices, -1).any()
+    for other in live_model.name_array[:20]:
+        if other != name:
+            assert name not in [n for n, _ in recommender.get_alternative_drugs(other)]
+
+
+def test_upsert_only(live_model):
+    source = live_model.name_array[7]
+    changed = live_model.name_array[8]
+    recommender.apply_updates([_row(live_model, 7, name="brand new drug"),
+                               _row(live_model, 8, Price=123.5)])
+    model = recommender.current_model()
+    assert model.n_items == live_model.n_items + 1
+    assert model.find(changed) == 8
+    assert model.record(8)['Price'] == pytest.approx(123.5)
+    # Same text as its source, so the source is a perfect match
+    name, similarity = recommender.get_alternative_drugs("brand new drug", k=1)[0]
+    assert similarity == pytest.approx(1.0)
+    assert model.find(name) is not None
+    # Scored against the source like any other drug (many share its text, so ties may hide it)
+    scores = model.engine.scores(model.find(source))
+    assert scores[model.find("brand new drug")] == pytest.approx(1.0)
+
+
+def test_upsert_and_delete(live_model):
+    deleted = live_model.name_array[10]
+    recommender.apply_updates([_row(live_model, 11, name="another new drug")], [deleted])
+    model = recommender.current_model()
+    assert model.n_items == live_model.n_items
+    assert model.find(deleted) is None
+    assert model.find("another new drug") == model.n_items - 1
+    assert model.engine.matrix.shape[0] == model.n_items
+
+
+def test_ann_update_does_not_rebuild_the_index(monkeypatch, live_model):
+    matrix = live_model.engine.matrix
+    engine = SimilarityEngine(matrix, ann_index=IVFIndex.build(matrix, n_components=32,
+                                                               n_lists=50))
+    recommender._publish(Model(live_model.df, live_model.tfidf, engine, live_model.version + 1))
+    monkeypatch.setattr(IVFIndex, "build", None)
+    deleted = live_model.name_array[12]
+    recommender.apply_updates([_row(live_model, 13, name="ann new drug")], [deleted])
+    model = recommender.current_model()
+    index = model.engine.ann_index
+    assert index.centroids is engine.ann_index.centroids
+    assert sorted(index.list_items.tolist()) == list(range(model.n_items))
+    assert model.find(deleted) is None
+    # Same text as row 13, so that row (or a duplicate of it) is a perfect match
+    name, similarity = recommender.get_alternative_drugs("ann new drug", k=1)[0]
+    assert similarity == pytest.approx(1.0)
+
+
+@pytest.fixture
+def update_log(monkeypatch, tmp_path):
+    """A fresh, empty update log for this test"""
+    path = tmp_path / "updates.jsonl"
+    monkeypatch.setattr(recommender, "UPDATES_PATH", str(path))
+    monkeypatch.setattr(recommender, "_updates_offset", 0)
+    return path
+
+
+@pytest.fixture
+def admin_client(monkeypatch, live_model, update_log):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    client = app.server.test_client()
+    return lambda body: client.post("/api/admin/drugs", json=body,
+                                    headers={"X-Admin-Token": "secret"})
+
+
+def test_admin_delete_only(admin_client, live_model):
+    response = admin_client({"delete": [live_model.name_array[0]]})
+    assert response.status_code == 200
+    assert response.get_json()['drugs'] == live_model.n_items - 1
+
+
+def test_admin_update_reaches_other_workers(admin_client, live_model, update_log):
+    response = admin_client({"upsert": [_row(live_model, 5, name="shared new drug")],
+                             "delete": [live_model.name_array[6]]})
+    assert response.status_code == 200
+    updated = recommender.current_model()
+    # Another worker: still on the old model and has applied none of the log
+    recommender._publish(live_model)
+    recommender._updates_offset = 0
+    recommender._background_reload()
+    model = recommender.current_model()
+    assert model is not live_model
+    assert model.name_array.tolist() == updated.name_array.tolist()
+    assert recommender._updates_offset == update_log.stat().st_size
+
+
+def test_update_log_replays_like_sequential_updates(live_model, update_log):
+    names = live_model.name_array
+    entries = [([_row(live_model, 1, name="log drug a"), _row(live_model, 2, name="log drug b")],
+                [names[3]]),
+               ([_row(live_model, 4, name="log drug a")], ["log drug b", names[5]]),
+               ([_row(live_model, 6, name=names[5]), _row(live_model, 7, name="log drug b")], []),
+               ([], ["log drug a"]),
+               ([_row(live_model, 8, name="log drug a")], [])]
+    for upserts, deletes in entries:
+        recommender.record_updates(upserts, deletes)
+    sequential = recommender.current_model()
+    recommender._publish(live_model)
+    # One folded replay, as a worker that starts after all the updates does
+    upserts, deletes, offset = recommender._read_updates(0)
+    recommender.apply_updates(upserts, deletes)
+    replayed = recommender.current_model()
+    assert replayed.name_array.tolist() == sequential.name_array.tolist()
+    assert (replayed.engine.matrix != sequential.engine.matrix).nnz == 0
+    assert offset == update_log.stat().st_size
+    # A line another worker has not finished writing is left for the next sync
+    with open(update_log, 'ab') as f:
+        f.write(b'{"upsert": [')
+    assert recommender._read_updates(offset) == ([], [], offset)
+
+
+@pytest.mark.parametrize("record", [
+    {"name": "bad price", "Price": "abc"},
+    {"name": "bad price", "Price": True},
+    {"name": ""},
+    {"name": "bad text", "uses_features": 5},
+    "not an object",
+])
+def test_admin_rejects_bad_upserts(admin_client, live_model, record):
+    response = admin_client({"upsert": [record]})
+    assert response.status_code == 400
+    assert recommender.current_model() is live_model
+
+
+def test_concurrent_reload_checks_start_one_reload(monkeypatch):
+    started = []
+    monkeypatch.setattr(recommender, "RELOAD_SECONDS", 60)
+    monkeypatch.setattr(recommender, "_last_reload_check", 0.0)
+    monkeypatch.setattr(recommender, "_data_stat", None)
+    monkeypatch.setattr(recommender, "_background_reload", lambda: started.append(1))
+    barrier = threading.Barrier(16)
+
+    def check():
+        barrier.wait()
+        recommender.maybe_reload()
+
+    threads = [threading.Thread(target=check) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.1)
+    assert len(started) == 1
+
+
+def test_background_reload_skips_while_locked(monkeypatch, live_model):
+    monkeypatch.setattr(recommender, "_data_stat", None)
+    with recommender._swap_lock:
+        recommender._background_reload()
+    assert recommender.current_model() is live_model